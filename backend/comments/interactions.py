@@ -0,0 +1,18 @@
+"""
+当前用户对评论的点赞状态批量加载
+"""
+
+from .models import CommentLike
+
+
+def get_comment_interaction_state(user, comment_ids):
+    """返回用户点赞过的评论ID集合，一次查询"""
+    comment_ids = list(comment_ids)
+    if not user or not user.is_authenticated or not comment_ids:
+        return {'liked_comment_ids': set()}
+    return {
+        'liked_comment_ids': set(
+            CommentLike.objects.filter(user=user, comment_id__in=comment_ids)
+            .values_list('comment_id', flat=True)
+        ),
+    }
@@ -0,0 +1,90 @@
+import io
+import uuid
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from comments.models import Comment, CommentImage
+from comments.views import CommentViewSet
+from posts.models import Post
+from tiebas.models import Tieba, TiebaMember
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 80, 80)).save(buffer, 'PNG')
+    return SimpleUploadedFile('benchmark.png', buffer.getvalue(), content_type='image/png')
+
+
+class Command(BaseCommand):
+    """统计发表一条评论/回复产生的 SQL 语句数"""
+
+    help = '统计通过评论接口发表顶级评论和回复时每条产生的 SQL 语句数（在回滚的事务中执行，不留下数据）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=20, help='顶级评论和回复各发表多少条')
+        parser.add_argument('--images', type=int, default=0, help='每条评论附带的图片数')
+
+    def handle(self, *args, **options):
+        self.view = CommentViewSet.as_view({'post': 'create'})
+        self.factory = APIRequestFactory()
+        self.images = options['images']
+        saved_files = []
+        try:
+            # 视图中的事务（savepoint=False）嵌在外层事务内不产生语句，
+            # 统计结果不含 BEGIN/COMMIT；提交后才执行的衍生图生成不会触发，也不计入
+            with transaction.atomic():
+                user, post = self._fixture()
+                top_level = [self._create(user, post) for _ in range(options['comments'])]
+                parent = Comment.objects.filter(post=post, parent__isnull=True).first()
+                replies = [self._create(user, post, parent) for _ in range(options['comments'])]
+                saved_files = list(CommentImage.objects.filter(comment__post=post).values_list('image', flat=True))
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            for name in saved_files:
+                CommentImage._meta.get_field('image').storage.delete(name)
+
+        self._report('顶级评论', top_level)
+        self._report('楼中楼回复', replies)
+
+    def _fixture(self):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(f'benchmark_{suffix}', password=uuid.uuid4().hex)
+        tieba = Tieba.objects.create(name=f'benchmark_{suffix}', description='benchmark', owner=user, status=1)
+        TiebaMember.objects.create(user=user, tieba=tieba, role=2, status=1)
+        post = Post.objects.create(title='benchmark', content='benchmark', author=user, tieba=tieba, status=1)
+        return user, post
+
+    def _create(self, user, post, parent=None):
+        data = {'post': post.pk, 'content': 'benchmark'}
+        if parent is not None:
+            data['parent'] = parent.pk
+        if self.images:
+            data['images'] = [_image() for _ in range(self.images)]
+        request = self.factory.post('/api/comments/comments/', data, format='multipart')
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.view(request)
+        if response.status_code != 201:
+            raise RuntimeError(f'创建评论失败: {response.status_code} {response.data}')
+        return len(queries.captured_queries)
+
+    def _report(self, label, counts):
+        if not counts:
+            return
+        average = sum(counts) / len(counts)
+        self.stdout.write(
+            f'{label}: 平均 {average:.1f} 条 SQL/条（最少 {min(counts)}，最多 {max(counts)}，'
+            f'图片 {self.images} 张）'
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from common.recount import rebuild_comment_paths
+
+
+class Command(BaseCommand):
+    """为缺少物化路径的回复补齐 path / depth"""
+
+    help = '为缺少物化路径的回复逐层补齐 Comment.path / depth（批量导入后执行）'
+
+    def handle(self, *args, **options):
+        updated = rebuild_comment_paths(stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'已补齐 {updated} 条回复的路径'))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['post', 'parent', 'floor_number'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['parent', 'created_at'], name='comment_replies_idx'),
+        ),
+    ]
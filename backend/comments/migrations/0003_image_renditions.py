@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0002_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='原图高度'),
+        ),
+        migrations.AddField(
+            model_name='commentimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, verbose_name='衍生图'),
+        ),
+        migrations.AddField(
+            model_name='commentimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='原图宽度'),
+        ),
+    ]
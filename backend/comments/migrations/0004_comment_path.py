@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+def fill_paths(apps, schema_editor):
+    """逐层为已有回复填写路径和层级（之后批量导入的数据用 rebuild_comment_paths 命令补齐）"""
+    Comment = apps.get_model('comments', 'Comment')
+    parent = Comment.objects.filter(pk=OuterRef('parent_id'))
+    pending = Comment.objects.filter(parent__isnull=False, path='').filter(
+        Q(parent__parent__isnull=True) | ~Q(parent__path='')
+    )
+    while pending.update(
+        path=Concat(
+            Subquery(parent.values('path')), Cast('parent_id', CharField()), Value('/'),
+            output_field=CharField(),
+        ),
+        depth=Subquery(parent.values('depth')) + 1,
+    ):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='层级'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500, verbose_name='祖先路径'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['path', 'created_at'], name='comment_path_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0004_comment_path'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_thread_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_replies_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_path_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['status', 'post', 'parent', 'floor_number'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['status', 'parent', 'created_at'], name='comment_replies_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['status', 'path', 'created_at'], name='comment_path_idx'),
+        ),
+    ]
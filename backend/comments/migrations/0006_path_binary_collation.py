@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# subtree_range 的区间查询要求 path 按字节比较：
+# 语言相关的排序规则可能忽略 '/'（如 glibc 的 en_US 下 '1/2/' 排在 '10' 之后），
+# 后代会落到区间外。SQLite 默认就是 BINARY，不需要修改。
+BINARY_COLLATION_SQL = {
+    'mysql': 'ALTER TABLE comment MODIFY path varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL',
+    'postgresql': 'ALTER TABLE comment ALTER COLUMN path TYPE varchar(500) COLLATE "C"',
+}
+
+
+def use_binary_collation(apps, schema_editor):
+    sql = BINARY_COLLATION_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0005_status_leading_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_binary_collation, migrations.RunPython.noop),
+    ]
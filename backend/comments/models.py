@@ -38,6 +38,11 @@ class Comment(models.Model):
     # 楼层信息
     floor_number = models.IntegerField('楼层', default=1)
     
+    # 物化路径：祖先评论ID依次以 / 结尾拼接，顶级评论为空串；depth 为回复层级
+    # （MySQL/PostgreSQL 下该列使用按字节比较的排序规则，见迁移 0006_path_binary_collation）
+    path = models.CharField('祖先路径', max_length=500, default='', blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField('层级', default=0, editable=False)
+    
     # 统计字段
     like_count = models.IntegerField('点赞数', default=0)
     reply_count = models.IntegerField('回复数', default=0)
@@ -54,9 +59,51 @@ class Comment(models.Model):
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['floor_number']
+        indexes = [
+            # 帖子楼层列表：status=1 AND post_id=? AND parent_id IS NULL ORDER BY floor_number
+            models.Index(
+                fields=['status', 'post', 'parent', 'floor_number'],
+                name='comment_thread_idx',
+            ),
+            # 楼中楼回复：status=1 AND parent_id=? ORDER BY created_at
+            models.Index(
+                fields=['status', 'parent', 'created_at'],
+                name='comment_replies_idx',
+            ),
+            # 整个对话（子树）：status=1 AND path >= ? AND path < ?
+            models.Index(
+                fields=['status', 'path', 'created_at'],
+                name='comment_path_idx',
+            ),
+        ]
     
     def __str__(self):
         return f'{self.author} 评论: {self.content[:50]}'
+    
+    @staticmethod
+    def child_path(parent):
+        """parent 的直接回复应有的路径"""
+        return f'{parent.path}{parent.pk}/'
+    
+    def subtree_range(self):
+        """该评论全部后代的路径区间 [low, high)
+        
+        后代路径都以 child_path 开头；'0' 紧跟在 '/' 之后，
+        把前缀末尾的 '/' 换成 '0' 即为上界，区间查询可以直接走索引。
+        区间按字节比较才成立，path 列的排序规则见迁移 0006_path_binary_collation。
+        """
+        low = self.child_path(self)
+        return low, low[:-1] + '0'
+    
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.split('/') if pk]
+    
+    def save(self, *args, **kwargs):
+        # 新建回复时根据父评论填写路径和层级
+        if self._state.adding and self.parent_id and not self.path:
+            self.path = self.child_path(self.parent)
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
 
 
 class CommentLike(models.Model):
@@ -98,6 +145,11 @@ class CommentImage(models.Model):
     image = models.ImageField('图片', upload_to='comment_images/')
     sort_order = models.IntegerField('排序', default=0)
     
+    # 衍生图信息，由后台任务生成后写入
+    width = models.PositiveIntegerField('原图宽度', null=True, blank=True)
+    height = models.PositiveIntegerField('原图高度', null=True, blank=True)
+    renditions = models.JSONField('衍生图', default=dict, blank=True)
+    
     class Meta:
         db_table = 'comment_image'
         verbose_name = '评论图片'
@@ -0,0 +1,152 @@
+"""
+评论楼层分页
+
+CommentFloorPagination 直接按楼层号定位，不产生 OFFSET 扫描，也不需要 COUNT(*)：
+
+- from_floor=N：从第 N 楼（含）开始向后
+- before_floor=N：第 N 楼之前的一页
+- around_floor=N：以第 N 楼为中心的一页（跳楼）
+- last=true：最后一页，从末尾倒序读取
+
+只返回顶级评论（楼层），条件落在 (post_id, parent_id, floor_number) 索引上，
+跳到任意楼层的开销都相同。
+"""
+
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CommentFloorPagination(BasePagination):
+    """评论楼层（键集）分页"""
+
+    floor_query_params = ('from_floor', 'before_floor', 'around_floor')
+    last_query_param = 'last'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    invalid_floor_message = '无效的楼层号'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return any(name in params for name in cls.floor_query_params) or (
+            params.get(cls.last_query_param) in ('true', '1')
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        # 楼层号只在顶级评论中唯一，回复通过 replies 接口获取
+        queryset = queryset.filter(parent__isnull=True)
+        forward = queryset.order_by('floor_number')
+        backward = queryset.order_by('-floor_number')
+        params = request.query_params
+
+        if 'around_floor' in params:
+            floor = self._floor(params['around_floor'])
+            before = list(backward.filter(floor_number__lt=floor)[:page_size // 2 + 1])
+            self.has_previous = len(before) > page_size // 2
+            before = before[:page_size // 2]
+            after = list(forward.filter(floor_number__gte=floor)[:page_size - len(before) + 1])
+            self.has_next = len(after) > page_size - len(before)
+            results = before[::-1] + after[:page_size - len(before)]
+        elif 'before_floor' in params or params.get(self.last_query_param) in ('true', '1'):
+            if 'before_floor' in params:
+                floor = self._floor(params['before_floor'])
+                backward = backward.filter(floor_number__lt=floor)
+                self.has_next = queryset.filter(floor_number__gte=floor).exists()
+            else:
+                self.has_next = False
+            results = list(backward[:page_size + 1])
+            self.has_previous = len(results) > page_size
+            results = results[:page_size][::-1]
+        else:
+            if 'from_floor' in params:
+                forward = forward.filter(floor_number__gte=self._floor(params['from_floor']))
+            results = list(forward[:page_size + 1])
+            self.has_next = len(results) > page_size
+            results = results[:page_size]
+            # 前面是否还有楼层只需沿索引探测一行
+            self.has_previous = bool(results) and queryset.filter(
+                floor_number__lt=results[0].floor_number
+            ).exists()
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def _floor(self, value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_floor_message)
+
+    def _link(self, param, floor):
+        url = self.base_url
+        for name in self.floor_query_params + (self.last_query_param,):
+            url = remove_query_param(url, name)
+        return replace_query_param(url, param, floor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link('from_floor', self.page[-1].floor_number + 1)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link('before_floor', self.page[0].floor_number)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_schema_operation_parameters(self, view):
+        descriptions = {
+            'from_floor': '从该楼层（含）开始向后',
+            'before_floor': '该楼层之前的一页',
+            'around_floor': '以该楼层为中心的一页',
+        }
+        parameters = [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': 'integer'},
+            }
+            for name, description in descriptions.items()
+        ]
+        parameters += [
+            {
+                'name': self.last_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '最后一页',
+                'schema': {'type': 'boolean'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '每页数量',
+                'schema': {'type': 'integer'},
+            },
+        ]
+        return parameters
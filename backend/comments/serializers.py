@@ -1,7 +1,18 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Comment, CommentLike, CommentImage
 from users.models import User
 from posts.models import Post
+from tiebas.activity import record_activity
+from tiebas.models import TiebaMember
+from posts import list_cache
+from posts.serializers import sized_image_url
+from common.counters import increment
+from common.fieldsets import SparseFieldsetSerializerMixin
+from common.images import schedule_derivatives
 
 
 class UserSimpleSerializer(serializers.ModelSerializer):
@@ -23,9 +34,15 @@ class PostSimpleSerializer(serializers.ModelSerializer):
 class CommentImageSerializer(serializers.ModelSerializer):
     """评论图片序列化器"""
     
+    url = serializers.SerializerMethodField()
+    
     class Meta:
         model = CommentImage
-        fields = ['id', 'image', 'sort_order']
+        fields = ['id', 'image', 'url', 'width', 'height', 'renditions', 'sort_order']
+    
+    def get_url(self, obj):
+        """按 image_size 参数（thumbnail/medium/original，默认 medium）选择图片地址"""
+        return sized_image_url(self.context.get('request'), obj)
 
 
 class CommentReplySerializer(serializers.ModelSerializer):
@@ -37,7 +54,7 @@ class CommentReplySerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = [
-            'id', 'content', 'author', 'author_info', 'parent',
+            'id', 'content', 'author', 'author_info', 'parent', 'depth',
             'floor_number', 'like_count', 'reply_count', 'status',
             'created_at', 'updated_at', 'is_liked'
         ]
@@ -45,18 +62,22 @@ class CommentReplySerializer(serializers.ModelSerializer):
     
     def get_is_liked(self, obj):
         """检查当前用户是否点赞了该评论"""
+        # 视图已批量加载整页（含预取的回复）状态时直接读取
+        liked_comment_ids = self.context.get('liked_comment_ids')
+        if liked_comment_ids is not None:
+            return obj.pk in liked_comment_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return CommentLike.objects.filter(user=request.user, comment=obj).exists()
         return False
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """评论序列化器"""
     
     author_info = UserSimpleSerializer(source='author', read_only=True)
     post_title = serializers.CharField(source='post.title', read_only=True)
-    replies = CommentReplySerializer(many=True, read_only=True)
+    replies = serializers.SerializerMethodField()
     images = CommentImageSerializer(many=True, read_only=True)
     is_liked = serializers.SerializerMethodField()
     
@@ -64,13 +85,26 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = [
             'id', 'content', 'author', 'author_info', 'post', 'post_title',
-            'parent', 'floor_number', 'like_count', 'reply_count', 'status',
+            'parent', 'depth', 'floor_number', 'like_count', 'reply_count', 'status',
             'created_at', 'updated_at', 'replies', 'images', 'is_liked'
         ]
         read_only_fields = ['author', 'floor_number', 'like_count', 'reply_count']
     
+    def get_replies(self, obj):
+        """楼层内最早的几条正常回复，完整列表见 replies 接口（reply_count 为总数）"""
+        replies = getattr(obj, 'reply_preview', None)
+        if replies is None:
+            replies = obj.replies.filter(status=1).select_related('author').order_by(
+                'created_at', 'id'
+            )[:settings.COMMENT_REPLY_PREVIEW_SIZE]
+        return CommentReplySerializer(replies, many=True, context=self.context).data
+    
     def get_is_liked(self, obj):
         """检查当前用户是否点赞了该评论"""
+        # 视图已批量加载整页（含预取的回复）状态时直接读取
+        liked_comment_ids = self.context.get('liked_comment_ids')
+        if liked_comment_ids is not None:
+            return obj.pk in liked_comment_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return CommentLike.objects.filter(user=request.user, comment=obj).exists()
@@ -80,6 +114,8 @@ class CommentSerializer(serializers.ModelSerializer):
 class CommentCreateSerializer(serializers.ModelSerializer):
     """评论创建序列化器"""
     
+    # 写评论只用到帖子的主键和所属贴吧，不读取正文
+    post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.defer('content'))
     images = serializers.ListField(
         child=serializers.ImageField(),
         required=False,
@@ -96,34 +132,65 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         parent = attrs.get('parent')
         
         # 如果parent存在，确保parent的post与当前post一致
-        if parent and parent.post != post:
+        if parent and parent.post_id != post.pk:
             raise serializers.ValidationError("回复的评论必须属于同一个帖子")
         
+        # 物化路径长度有限，超出时无法再嵌套回复
+        if parent and len(Comment.child_path(parent)) > Comment._meta.get_field('path').max_length:
+            raise serializers.ValidationError("回复层级过深")
+        
         return attrs
     
     def create(self, validated_data):
-        """创建评论"""
-        images = validated_data.pop('images', [])
-        comment = Comment.objects.create(**validated_data)
+        """创建评论
         
-        # 创建评论图片
-        for i, image in enumerate(images):
-            CommentImage.objects.create(
-                comment=comment,
-                image=image,
-                sort_order=i
+        楼层号、评论、图片和各项计数在同一个事务中写入；计数都用 F() 只更新计数列，
+        中途失败时整体回滚，领取的楼层号也一并回滚，不会留下错误的计数。
+        """
+        images = validated_data.pop('images', [])
+        post = validated_data['post']
+        parent = validated_data.get('parent')
+        with transaction.atomic(savepoint=False):
+            if parent is None:
+                # 顶级评论原子地领取帖子的下一个楼层号，
+                # 同一条 UPDATE 顺带更新帖子回复数和最后回复时间
+                validated_data['floor_number'] = increment(
+                    Post, post.pk, 'next_floor',
+                    extra_deltas={'reply_count': 1}, assignments={'last_reply_at': timezone.now()}
+                ) - 1
+            else:
+                # 回复使用父评论的楼层号
+                validated_data['floor_number'] = parent.floor_number
+                Post.objects.filter(pk=post.pk).update(
+                    reply_count=F('reply_count') + 1, last_reply_at=timezone.now()
+                )
+            comment = Comment.objects.create(**validated_data)
+            
+            # 评论图片一次批量插入，衍生图在事务提交后由后台生成
+            comment_images = CommentImage.objects.bulk_create([
+                CommentImage(comment=comment, image=image, sort_order=i)
+                for i, image in enumerate(images)
+            ])
+            image_ids = [image.pk for image in comment_images]
+            if comment_images and not connection.features.can_return_rows_from_bulk_insert:
+                # MySQL 批量插入不返回主键，按评论重新查出
+                image_ids = list(
+                    CommentImage.objects.filter(comment=comment).order_by('sort_order').values_list('pk', flat=True)
+                )
+            schedule_derivatives('comments.CommentImage', image_ids)
+            
+            # 如果是对评论的回复，更新父评论的回复数
+            if comment.parent_id:
+                Comment.objects.filter(pk=comment.parent_id).update(reply_count=F('reply_count') + 1)
+            # 用户评论数和在该贴吧的评论数（非成员时没有成员记录，不更新）
+            User.objects.filter(pk=comment.author_id).update(comment_count=F('comment_count') + 1)
+            TiebaMember.objects.filter(user_id=comment.author_id, tieba_id=post.tieba_id).update(
+                comment_count=F('comment_count') + 1, last_active_at=timezone.now()
             )
-        
-        # 更新帖子回复数
-        post = comment.post
-        post.reply_count += 1
-        post.last_reply_at = comment.created_at
-        post.save()
-        
-        # 如果是对评论的回复，更新父评论的回复数
-        if comment.parent:
-            comment.parent.reply_count += 1
-            comment.parent.save()
+            record_activity(post.tieba_id, user_id=comment.author_id, comments=1)
+            
+            # 回复会改变列表中的回复数和最后回复时间，提交后再使列表缓存失效
+            transaction.on_commit(lambda: list_cache.bump_version(post.tieba_id))
         
         return comment
 
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.conditional import bump_object_version
+
+from .models import Comment
+
+
+def reply_changed(comment):
+    """回复的内容、点赞变化后使父评论详情的 ETag 失效（详情中带有回复预览）"""
+    parent_id = comment.parent_id
+    if parent_id:
+        transaction.on_commit(lambda: bump_object_version(Comment, parent_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_parent_detail(sender, instance, **kwargs):
+    reply_changed(instance)
@@ -0,0 +1,59 @@
+"""
+评论楼层号领取的并发测试
+"""
+
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from common.tests import THREADS, run_concurrently
+from posts.models import Post
+from tiebas.models import Tieba
+from users.models import User
+
+from .models import Comment
+
+COMMENTS_URL = '/api/comments/comments/'
+
+
+class FloorNumberConcurrencyTests(TransactionTestCase):
+
+    def setUp(self):
+        author = User.objects.create_user('author', password='pw12345')
+        tieba = Tieba.objects.create(name='并发吧', owner=author, status=1)
+        self.post = Post.objects.create(
+            title='并发', content='并发测试', author=author, tieba=tieba, status=1
+        )
+        self.users = [User.objects.create_user(f'user{i}', password='pw12345') for i in range(THREADS)]
+
+    def comment(self, user, parent=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        data = {'post': self.post.pk, 'content': f'{user.username} 的评论'}
+        if parent is not None:
+            data['parent'] = parent.pk
+        return client.post(COMMENTS_URL, data).status_code
+
+    def test_top_level_comments_get_distinct_floors(self):
+        statuses = run_concurrently(self.comment, [(user,) for user in self.users])
+
+        self.assertEqual(statuses, [201] * THREADS)
+        floors = sorted(Comment.objects.filter(post=self.post).values_list('floor_number', flat=True))
+        self.assertEqual(floors, list(range(1, THREADS + 1)))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.next_floor, THREADS + 1)
+        self.assertEqual(self.post.reply_count, THREADS)
+
+    def test_replies_do_not_claim_floors(self):
+        self.assertEqual(self.comment(self.users[0]), 201)
+        parent = Comment.objects.get(post=self.post)
+
+        statuses = run_concurrently(self.comment, [(user, parent) for user in self.users])
+
+        self.assertEqual(statuses, [201] * THREADS)
+        self.assertEqual(
+            set(Comment.objects.filter(parent=parent).values_list('floor_number', flat=True)),
+            {parent.floor_number},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.next_floor, 2)
+        self.assertEqual(self.post.reply_count, THREADS + 1)
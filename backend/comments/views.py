@@ -1,30 +1,99 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from common.conditional import ConditionalGetMixin
+from common.counters import toggle_relation
+from common.fieldsets import SparseFieldsetViewMixin
+from .interactions import get_comment_interaction_state
+from .pagination import CommentFloorPagination
 from .models import Comment, CommentLike, CommentImage
+from .signals import reply_changed
 from .serializers import (
     CommentSerializer, CommentCreateSerializer, 
-    CommentLikeSerializer
+    CommentLikeSerializer, CommentReplySerializer
 )
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """评论视图集"""
     
     queryset = Comment.objects.filter(status=1)  # 只显示正常状态的评论
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # 作者资料和帖子标题嵌套在响应中，其更新时间参与 ETag；
+    # 回复预览的内容、点赞变化通过 signals.reply_changed 使父评论的版本号失效
+    etag_fields = ('updated_at', 'like_count', 'reply_count', 'author__updated_at', 'post__updated_at')
+    last_modified_fields = ('updated_at', 'author__updated_at', 'post__updated_at')
+    sparse_select_related = {'author_info': 'author', 'post_title': 'post'}
+    # replies 每层只预取前几条，见 with_reply_preview
+    sparse_prefetch_related = {'images': 'images'}
+    # 只用到帖子标题，不加载帖子正文
+    sparse_related_deferred = {'post_title': ('post__content',)}
     
     def get_serializer_class(self):
         if self.action == 'create':
             return CommentCreateSerializer
         return CommentSerializer
     
+    @property
+    def paginator(self):
+        """按帖子查看楼层并带楼层定位参数时使用楼层分页，否则保持页码分页"""
+        if not hasattr(self, '_paginator'):
+            if (self.action == 'list' and self.request.query_params.get('post_id')
+                    and CommentFloorPagination.is_requested(self.request)):
+                self._paginator = CommentFloorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
+    def get_reply_preview_size(self):
+        """每层楼预加载的回复条数，可用 reply_limit 参数调整（0~20）"""
+        try:
+            size = int(self.request.query_params.get('reply_limit', settings.COMMENT_REPLY_PREVIEW_SIZE))
+        except ValueError:
+            size = settings.COMMENT_REPLY_PREVIEW_SIZE
+        return max(0, min(size, 20))
+    
+    def with_reply_preview(self, queryset):
+        """每层楼只预取最早的几条正常回复
+        
+        切片的 Prefetch 会生成一条 ROW_NUMBER() OVER (PARTITION BY parent_id ...) 窗口查询，
+        整页的回复预览一次取出，热门楼层再多回复也不会拖慢列表；其余回复走 replies 接口分页。
+        """
+        selection = self.get_sparse_fields()
+        if selection is not None and 'replies' not in selection:
+            return queryset
+        size = self.get_reply_preview_size()
+        replies = Comment.objects.filter(status=1).select_related('author').order_by('created_at', 'id')
+        # 切片的 Prefetch 必须使用 to_attr，否则关联管理器会在切片后再次过滤而报错
+        return queryset.prefetch_related(
+            Prefetch('replies', queryset=replies[:size], to_attr='reply_preview')
+        )
+    
+    def get_serializer(self, *args, **kwargs):
+        """序列化评论时批量加载当前用户对评论及其预取回复的点赞状态"""
+        serializer_class = self.get_serializer_class()
+        kwargs.setdefault('context', self.get_serializer_context())
+        selection = self.get_sparse_fields()
+        wants_state = selection is None or {'is_liked', 'replies'} & selection
+        if args and serializer_class is CommentSerializer and wants_state:
+            comments = args[0] if kwargs.get('many') else [args[0]]
+            comment_ids = []
+            for comment in comments:
+                comment_ids.append(comment.pk)
+                # 只收集已预取的回复，避免在这里触发额外查询
+                comment_ids.extend(reply.pk for reply in getattr(comment, 'reply_preview', ()))
+            kwargs['context'].update(get_comment_interaction_state(self.request.user, comment_ids))
+        return serializer_class(*args, **kwargs)
+    
     def get_queryset(self):
         """过滤查询集"""
-        queryset = super().get_queryset()
+        queryset = self.apply_sparse_fieldset(super().get_queryset())
+        if self.action not in ('replies', 'conversation'):
+            queryset = self.with_reply_preview(queryset)
         
         # 按帖子过滤
         post_id = self.request.query_params.get('post_id')
@@ -43,67 +112,75 @@ class CommentViewSet(viewsets.ModelViewSet):
         return queryset.order_by('floor_number')
     
     def perform_create(self, serializer):
-        """创建评论时设置作者和楼层号"""
-        post = serializer.validated_data.get('post')
-        parent = serializer.validated_data.get('parent')
-        
-        # 如果是顶级评论，计算楼层号
-        if not parent:
-            last_comment = Comment.objects.filter(post=post, parent__isnull=True).order_by('-floor_number').first()
-            floor_number = last_comment.floor_number + 1 if last_comment else 1
-        else:
-            floor_number = parent.floor_number  # 回复使用父评论的楼层号
-        
-        serializer.save(author=self.request.user, floor_number=floor_number)
+        """创建评论时设置作者（楼层号在序列化器的事务中领取）"""
+        serializer.save(author=self.request.user)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
-        """点赞评论"""
+        """点赞评论（重复点赞不报错）"""
         comment = self.get_object()
-        
-        # 检查是否已经点赞
-        if CommentLike.objects.filter(user=request.user, comment=comment).exists():
-            return Response(
-                {'error': '您已经点赞过该评论'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # 创建点赞记录
-        CommentLike.objects.create(user=request.user, comment=comment)
-        
-        # 更新评论点赞数
-        comment.like_count += 1
-        comment.save()
-        
-        return Response({'message': '点赞成功', 'like_count': comment.like_count})
+        changed, like_count = toggle_relation(
+            CommentLike, {'user': request.user, 'comment': comment},
+            Comment, comment.pk, 'like_count', active=True
+        )
+        if changed:
+            reply_changed(comment)
+        message = '点赞成功' if changed else '您已经点赞过该评论'
+        return Response({'message': message, 'like_count': like_count, 'is_liked': True})
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def unlike(self, request, pk=None):
-        """取消点赞"""
+        """取消点赞（未点赞时不报错）"""
         comment = self.get_object()
-        
-        try:
-            like = CommentLike.objects.get(user=request.user, comment=comment)
-            like.delete()
-            
-            # 更新评论点赞数
-            comment.like_count -= 1
-            comment.save()
-            
-            return Response({'message': '取消点赞成功', 'like_count': comment.like_count})
-        except CommentLike.DoesNotExist:
-            return Response(
-                {'error': '您还没有点赞过该评论'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        changed, like_count = toggle_relation(
+            CommentLike, {'user': request.user, 'comment': comment},
+            Comment, comment.pk, 'like_count', active=False
+        )
+        if changed:
+            reply_changed(comment)
+        message = '取消点赞成功' if changed else '您还没有点赞过该评论'
+        return Response({'message': message, 'like_count': like_count, 'is_liked': False})
     
     @action(detail=True, methods=['get'])
     def replies(self, request, pk=None):
-        """获取评论的回复列表"""
+        """分页获取评论的回复列表"""
         comment = self.get_object()
-        replies = Comment.objects.filter(parent=comment, status=1).order_by('created_at')
+        replies = self.with_reply_preview(self.apply_sparse_fieldset(
+            Comment.objects.filter(parent=comment, status=1)
+        )).order_by('created_at', 'id')
+        page = self.paginate_queryset(replies)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(replies, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def conversation(self, request, pk=None):
+        """加载整个对话：该评论下所有层级的回复（按时间分页）及其祖先链
+        
+        后代按物化路径区间一次查出，不随回复层级逐层请求。
+        """
+        comment = self.get_object()
+        low, high = comment.subtree_range()
+        descendants = Comment.objects.filter(
+            status=1, path__gte=low, path__lt=high
+        ).select_related('author').order_by('created_at', 'id')
+        
+        page = self.paginate_queryset(descendants)
+        rows = page if page is not None else list(descendants)
+        ancestors = list(
+            Comment.objects.filter(pk__in=comment.ancestor_ids(), status=1)
+            .select_related('author').order_by('depth')
+        )
+        context = self.get_serializer_context()
+        context.update(get_comment_interaction_state(
+            request.user, [c.pk for c in rows] + [c.pk for c in ancestors]
+        ))
+        data = CommentReplySerializer(rows, many=True, context=context).data
+        response = self.get_paginated_response(data) if page is not None else Response({'results': data})
+        response.data['ancestors'] = CommentReplySerializer(ancestors, many=True, context=context).data
+        return response
 
 
 class CommentLikeViewSet(viewsets.ModelViewSet):
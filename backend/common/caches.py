@@ -0,0 +1,19 @@
+"""
+缓存后端是否跨进程共享
+
+locmem 等进程内缓存只在当前进程可见，signals 中的主动失效到不了其他 worker；
+依赖主动失效保证正确性的缓存在这类后端上要么不缓存，要么只允许短时间过期
+（见 settings.LOCAL_CACHE_STALE_TIMEOUT）。多进程部署应使用 CACHE_BACKEND=redis。
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# 不跨进程共享的缓存后端
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared_cache(alias='default'):
+    """缓存后端在多个进程之间共享时返回 True"""
+    return not isinstance(caches[alias], PROCESS_LOCAL_BACKENDS)
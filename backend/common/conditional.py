@@ -0,0 +1,103 @@
+"""
+详情接口的条件请求（ETag / Last-Modified）
+
+在序列化之前用一条只取少量列的 values() 查询算出校验值，
+客户端带 If-None-Match / If-Modified-Since 且未变化时直接返回 304。
+"""
+
+import calendar
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .caches import is_shared_cache
+
+
+def _version_key(model, pk):
+    return f'etag_version:{model._meta.label_lower}:{pk}'
+
+
+def _object_version(model, pk):
+    """对象的版本号；缓存不跨进程共享时其他进程的 bump 看不到，附加时间段使旧 ETag 定期失效"""
+    version = str(cache.get(_version_key(model, pk), 0))
+    if not is_shared_cache():
+        version += f'.{int(time.time()) // settings.LOCAL_CACHE_STALE_TIMEOUT}'
+    return version
+
+
+def bump_object_version(model, pk):
+    """对象有 updated_at 和计数都反映不出的变化时（如衍生图生成完成），使其 ETag 失效"""
+    key = _version_key(model, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+class ConditionalGetMixin:
+    """为 ViewSet 的 retrieve 增加条件请求支持
+
+    etag_fields 为参与 ETag 计算的列（更新时间、计数等），可以跨关联取列
+    （如 author__updated_at），嵌套输出的关联对象变化时 ETag 随之变化；
+    last_modified_fields 中的最大值作为 Last-Modified。
+    ETag 同时包含当前用户ID，因为响应里有 is_liked 等与用户相关的字段。
+    """
+
+    etag_fields = ('updated_at',)
+    last_modified_fields = ('updated_at',)
+
+    def get_etag_extra(self):
+        """额外参与 ETag 计算的值（如随日期变化的统计），默认没有"""
+        return []
+
+    def get_validators(self):
+        """返回 (etag, last_modified 时间戳)，对象不存在时返回 None"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fields = list(dict.fromkeys(self.etag_fields + self.last_modified_fields))
+        row = self.filter_queryset(self.get_queryset()).prefetch_related(None).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).values('pk', *fields).first()
+        if row is None:
+            return None
+
+        model = self.get_queryset().model
+        user = self.request.user
+        parts = [
+            str(row[field]) for field in self.etag_fields
+        ] + [
+            _object_version(model, row['pk']),
+            str(user.pk) if user.is_authenticated else 'anon',
+        ] + [str(value) for value in self.get_etag_extra()]
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+
+        timestamps = [row[field] for field in self.last_modified_fields if row[field]]
+        last_modified = calendar.timegm(max(timestamps).utctimetuple()) if timestamps else None
+        return etag, last_modified
+
+    def get_not_modified_response(self, request, validators):
+        """客户端缓存仍然有效时返回 304 响应，否则返回 None"""
+        if validators is None:
+            return None
+        etag, last_modified = validators
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    def set_validator_headers(self, response, validators):
+        if validators is not None and response.status_code == 200:
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Cookie', 'Authorization'))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        not_modified = self.get_not_modified_response(request, validators)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return self.set_validator_headers(response, validators)
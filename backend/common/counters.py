@@ -0,0 +1,134 @@
+"""
+计数字段的原子更新
+
+所有计数都用 F() 表达式在数据库端增减，只写计数列，
+避免读-改-写整行导致的丢失更新。
+"""
+
+import sqlite3
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+
+def _supports_update_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def increment(model, pk, field, delta=1, extra_deltas=None, assignments=None):
+    """把 model(pk).field 加上 delta，返回更新后的值；行不存在时返回 None
+
+    extra_deltas（列 -> 增量）和 assignments（列 -> 新值）在同一条 UPDATE 中
+    顺带写入同一行的其他列，省去对该行的第二次写入。
+    支持 UPDATE ... RETURNING 的数据库一次往返完成，其余数据库更新后再读取该列。
+    """
+    deltas = {field: delta, **(extra_deltas or {})}
+    assignments = assignments or {}
+    if _supports_update_returning():
+        qn = connection.ops.quote_name
+        fields = {name: model._meta.get_field(name) for name in [*deltas, *assignments]}
+        sets = [f'{qn(fields[name].column)} = {qn(fields[name].column)} + %s' for name in deltas]
+        sets += [f'{qn(fields[name].column)} = %s' for name in assignments]
+        params = list(deltas.values()) + [
+            fields[name].get_db_prep_save(value, connection) for name, value in assignments.items()
+        ]
+        column = qn(fields[field].column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {qn(model._meta.db_table)} SET {", ".join(sets)} '
+                f'WHERE {qn(model._meta.pk.column)} = %s RETURNING {column}',
+                params + [pk],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    queryset = model.objects.filter(pk=pk)
+    if not queryset.update(**{name: F(name) + value for name, value in deltas.items()}, **assignments):
+        return None
+    return queryset.values_list(field, flat=True).first()
+
+
+def _supports_upsert():
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 24, 0)
+
+
+def upsert_increment(model, keys, deltas):
+    """按唯一键 keys 累加计数，行不存在时先插入
+
+    支持 INSERT ... ON CONFLICT DO UPDATE 的数据库一条语句完成；
+    其余数据库先 UPDATE，没有命中再插入（并发插入冲突时重试 UPDATE）。
+    """
+    if not deltas:
+        return
+    if _supports_upsert():
+        qn = connection.ops.quote_name
+        columns, values = [], []
+        for field in model._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            if field.attname in keys:
+                value = keys[field.attname]
+            elif field.attname in deltas:
+                value = deltas[field.attname]
+            else:
+                value = field.get_default()
+            columns.append(qn(field.column))
+            values.append(field.get_db_prep_save(value, connection))
+        conflict = ', '.join(qn(model._meta.get_field(name).column) for name in keys)
+        updates = ', '.join(
+            f'{qn(column)} = {qn(model._meta.db_table)}.{qn(column)} + excluded.{qn(column)}'
+            for column in (model._meta.get_field(name).column for name in deltas)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(model._meta.db_table)} ({", ".join(columns)}) '
+                f'VALUES ({", ".join(["%s"] * len(values))}) '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                values,
+            )
+        return
+
+    increments = {name: F(name) + delta for name, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # 并发请求已经插入了这一行
+        model.objects.filter(**keys).update(**increments)
+
+
+def toggle_relation(relation_model, lookup, counter_model, counter_pk, counter_field, active):
+    """幂等地建立/解除一条关系记录（如点赞、收藏），并同步对应计数
+
+    active=True 时插入（已存在则忽略），False 时删除（不存在则忽略）；
+    只有记录真正发生变化时才调整计数。返回 (是否发生变化, 最新计数)。
+    """
+    delta = 1 if active else -1
+    with transaction.atomic():
+        # 先调整计数再改关系记录：第一条语句就是写操作，SQLite 下不会出现共享锁升级失败
+        # （删除带信号的记录时 Django 会先查询）；各路径都先锁计数行，加锁顺序一致
+        count = increment(counter_model, counter_pk, counter_field, delta)
+        if active:
+            try:
+                with transaction.atomic():
+                    relation_model.objects.create(**lookup)
+                changed = True
+            except IntegrityError:
+                # unique_together 冲突说明记录已存在
+                changed = False
+        else:
+            deleted, _ = relation_model.objects.filter(**lookup).delete()
+            changed = deleted > 0
+
+        if not changed:
+            # 记录没有变化，撤销预先调整的计数
+            transaction.set_rollback(True)
+            if count is not None:
+                count -= delta
+    return changed, count
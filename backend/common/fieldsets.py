@@ -0,0 +1,112 @@
+"""
+稀疏字段集：?fields= / ?exclude= / ?expand=
+
+- fields：只返回列出的字段（id 总是返回）
+- exclude：去掉列出的字段
+- expand：列表接口默认不返回的大字段（Meta.list_expandable_fields，如帖子正文），
+  需要时显式展开
+
+视图根据最终字段集决定 select_related / prefetch_related / defer，
+没有请求的嵌套对象既不序列化也不预取，没有请求的大字段不从数据库读取。
+"""
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _param_set(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return set()
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+_field_names = {}
+
+
+def _all_field_names(serializer_class):
+    if serializer_class not in _field_names:
+        _field_names[serializer_class] = list(serializer_class(context={}).fields)
+    return _field_names[serializer_class]
+
+
+def selected_fields(serializer_class, request, action=None):
+    """根据请求参数计算要返回的字段集合；写请求返回 None（不裁剪）"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    all_fields = _all_field_names(serializer_class)
+    requested = _param_set(request, 'fields')
+    excluded = _param_set(request, 'exclude')
+    expanded = _param_set(request, 'expand')
+
+    meta = getattr(serializer_class, 'Meta', None)
+    expandable = set(getattr(meta, 'list_expandable_fields', ()))
+
+    if requested:
+        selection = {name for name in all_fields if name in requested or name == 'id'}
+    else:
+        selection = set(all_fields)
+        if action != 'retrieve':
+            selection -= expandable - expanded
+    selection |= expandable & expanded & set(all_fields)
+    selection -= excluded - {'id'}
+    return selection
+
+
+class SparseFieldsetSerializerMixin:
+    """按请求参数裁剪序列化器字段"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        view = self.context.get('view')
+        selection = selected_fields(type(self), request, getattr(view, 'action', None))
+        if selection is None:
+            return
+        for name in list(self.fields):
+            if name not in selection:
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """按最终字段集构造查询集
+
+    sparse_select_related: {序列化字段: select_related 路径}
+    sparse_prefetch_related: {序列化字段: prefetch_related 路径}
+    sparse_deferred: {序列化字段: 不需要时 defer 的列}
+    sparse_related_deferred: {序列化字段: 需要时随 select_related 一起 defer 的关联表列}
+    """
+
+    sparse_select_related = {}
+    sparse_prefetch_related = {}
+    sparse_deferred = {}
+    sparse_related_deferred = {}
+
+    def get_sparse_fields(self):
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            return None
+        return selected_fields(serializer_class, self.request, getattr(self, 'action', None))
+
+    def apply_sparse_fieldset(self, queryset):
+        selection = self.get_sparse_fields()
+
+        def wanted(name):
+            return selection is None or name in selection
+
+        select = [path for name, path in self.sparse_select_related.items() if wanted(name)]
+        prefetch = [path for name, path in self.sparse_prefetch_related.items() if wanted(name)]
+        deferred = [
+            column for name, columns in self.sparse_deferred.items() if not wanted(name)
+            for column in ([columns] if isinstance(columns, str) else columns)
+        ] + [
+            column for name, columns in self.sparse_related_deferred.items() if wanted(name)
+            for column in columns
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        return queryset
+
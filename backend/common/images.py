@@ -0,0 +1,160 @@
+"""
+上传图片的衍生图生成
+
+发帖/评论时只保存原图，缩略图、中图在后台进程池中用 Pillow 生成，
+生成结果（文件名、尺寸）写回图片记录的 renditions 字段，
+请求线程不再等待图片解码与缩放。
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .conditional import bump_object_version
+
+logger = logging.getLogger(__name__)
+
+# 图片模型 -> (所属对象模型, 外键字段)
+PARENT_FIELDS = {
+    'posts.postimage': ('posts.Post', 'post'),
+    'comments.commentimage': ('comments.Comment', 'comment'),
+}
+
+DEFAULT_OPTIONS = {
+    'ASYNC': True,
+    'WORKERS': 2,
+    # 衍生图名称 -> 最长边像素
+    'SIZES': {'thumbnail': 240, 'medium': 960},
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+}
+
+
+def get_options():
+    options = dict(DEFAULT_OPTIONS)
+    options.update(getattr(settings, 'IMAGE_DERIVATIVES', {}))
+    return options
+
+
+def render_renditions(data, sizes, image_format='WEBP', quality=80):
+    """解码原图并按 sizes 生成衍生图（在子进程中执行）
+
+    返回 (原图宽, 原图高, {名称: (图片字节, 扩展名, 宽, 高)})。
+    """
+    if image_format == 'WEBP' and not features.check('webp'):
+        image_format = 'JPEG'
+    extension = 'webp' if image_format == 'WEBP' else 'jpg'
+
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        width, height = source.size
+        if image_format == 'JPEG' and source.mode not in ('RGB', 'L'):
+            source = source.convert('RGB')
+
+        renditions = {}
+        for name, max_side in sizes.items():
+            image = source.copy()
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, quality=quality, optimize=True)
+            renditions[name] = (buffer.getvalue(), extension, image.width, image.height)
+    return width, height, renditions
+
+
+_process_pool = None
+_dispatcher = None
+_pool_lock = threading.Lock()
+
+
+def _get_executors():
+    global _process_pool, _dispatcher
+    with _pool_lock:
+        if _process_pool is None:
+            workers = get_options()['WORKERS']
+            _process_pool = ProcessPoolExecutor(max_workers=workers)
+            # 分发线程负责读写存储和数据库，解码缩放交给进程池
+            _dispatcher = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-derivatives')
+    return _process_pool, _dispatcher
+
+
+def generate_derivatives(model_label, pk, process_pool=None):
+    """为一条图片记录生成衍生图并写回数据库"""
+    model = apps.get_model(model_label)
+    options = get_options()
+    record = model.objects.filter(pk=pk).first()
+    if record is None or not record.image:
+        return None
+
+    with record.image.open('rb') as f:
+        data = f.read()
+    args = (data, options['SIZES'], options['FORMAT'], options['QUALITY'])
+    if process_pool is not None:
+        width, height, rendered = process_pool.submit(render_renditions, *args).result()
+    else:
+        width, height, rendered = render_renditions(*args)
+
+    directory, filename = os.path.split(record.image.name)
+    stem = os.path.splitext(filename)[0]
+    renditions = {}
+    for name, (content, extension, r_width, r_height) in rendered.items():
+        saved_name = default_storage.save(
+            os.path.join(directory, name, f'{stem}.{extension}'), ContentFile(content)
+        )
+        renditions[name] = {'name': saved_name, 'width': r_width, 'height': r_height}
+
+    # 只更新衍生图相关的列，并使所属帖子/评论的 ETag 失效
+    model.objects.filter(pk=pk).update(width=width, height=height, renditions=renditions)
+    parent = PARENT_FIELDS.get(model._meta.label_lower)
+    if parent is not None:
+        parent_label, parent_field = parent
+        bump_object_version(apps.get_model(parent_label), getattr(record, f'{parent_field}_id'))
+    return renditions
+
+
+def _run_in_background(model_label, pk):
+    process_pool, _ = _get_executors()
+    close_old_connections()
+    try:
+        generate_derivatives(model_label, pk, process_pool)
+    except Exception:
+        logger.exception('生成衍生图失败: %s(%s)', model_label, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(model_label, pks):
+    """事务提交后为图片记录生成衍生图
+
+    ASYNC=True 时交给后台线程+进程池，请求立即返回；否则同步生成。
+    """
+    pks = list(pks)
+    if not pks:
+        return
+
+    def dispatch():
+        if get_options()['ASYNC']:
+            _, dispatcher = _get_executors()
+            for pk in pks:
+                dispatcher.submit(_run_in_background, model_label, pk)
+        else:
+            for pk in pks:
+                generate_derivatives(model_label, pk)
+
+    transaction.on_commit(dispatch)
+
+
+def rendition_url(image_field, renditions, size):
+    """按尺寸名选择图片地址，衍生图尚未生成时退回原图"""
+    rendition = (renditions or {}).get(size)
+    if rendition:
+        return default_storage.url(rendition['name'])
+    return image_field.url if image_field else None
@@ -0,0 +1,155 @@
+"""
+键集（游标）分页
+
+KeysetCursorPagination 按排序列的元组比较翻页：翻页条件直接落在排序列上，
+不产生 OFFSET 扫描，也不需要 COUNT(*)，最后一页和第一页的开销相同。
+子类只声明 ordering 和 cursor_fields，排序应有对应的索引。
+"""
+
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# 游标中各类型的值与字符串互相转换：类型 -> (编码, 解码)
+CURSOR_CODECS = {
+    bool: (lambda value: '1' if value else '0', lambda text: text == '1'),
+    int: (str, int),
+    datetime: (lambda value: value.isoformat(), datetime.fromisoformat),
+}
+
+
+class KeysetCursorPagination(BasePagination):
+    """键集（游标）分页基类
+
+    ordering 为排序列（'-' 表示降序），最后一列须唯一（通常是 id）；
+    cursor_fields 为与 ordering 一一对应的 (字段名, 类型)，类型见 CURSOR_CODECS。
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    invalid_cursor_message = '无效的游标'
+
+    ordering = ()
+    cursor_fields = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        queryset = queryset.order_by(*(self._reversed_ordering() if reverse else self.ordering))
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position, reverse))
+
+        # 多取一条用于判断是否还有下一页
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def _reversed_ordering(self):
+        """向前翻页时的排序：每一列反向"""
+        return tuple(term[1:] if term.startswith('-') else f'-{term}' for term in self.ordering)
+
+    def _seek_filter(self, position, reverse):
+        """排序列元组比较展开成的过滤条件：前几列相等、下一列越过游标位置"""
+        condition = Q()
+        equal = {}
+        for term, value in zip(self.ordering, position):
+            descending = term.startswith('-')
+            field = term.lstrip('-')
+            op = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{op}': value})
+            equal[field] = value
+        return condition
+
+    def decode_cursor(self, request):
+        """解析游标，返回 (位置, 是否向前翻页)"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            direction, *values = raw.split('|')
+            if len(values) != len(self.cursor_fields):
+                raise ValueError(raw)
+            position = tuple(
+                CURSOR_CODECS[kind][1](value) for (_, kind), value in zip(self.cursor_fields, values)
+            )
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position, direction == 'p'
+
+    def encode_cursor(self, instance, reverse=False):
+        raw = '|'.join([
+            'p' if reverse else 'n',
+            *(CURSOR_CODECS[kind][0](getattr(instance, field)) for field, kind in self.cursor_fields),
+        ])
+        cursor = base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '分页游标',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '每页数量',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,356 @@
+"""
+冗余计数字段的重新计算与核对
+
+每个计数字段都声明为 CounterSpec：从哪张源表、按什么关联条件、用什么聚合得出。
+recount() 按主键区间分块执行集合式 UPDATE，每块单独提交，不会长时间锁表。
+reconcile() 同样分块，每块用一条 GROUP BY 算出应有值并与当前值比对，
+报告偏差，需要时只修复有偏差的行；也可以只核对上次运行之后有变化的行。
+"""
+
+from django.apps import apps
+from django.db.models import CharField, Count, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Concat, Greatest
+
+
+class CounterSpec:
+    """一个冗余计数字段的定义
+
+    links 为 {源表字段: 目标表字段}，例如 {'post': 'pk'} 表示
+    Comment.post_id = Post.id；aggregate 为 'count'、('max', 字段名) 或 ('sum', 字段名)。
+    changed_by 为 [(源表, links)]：源表本身的变化时间反映不出、但会改变该计数的其他表，
+    增量核对时这些表有变化的目标行也要核对。
+    """
+
+    def __init__(self, model, field, source, links, condition=None, aggregate='count', changed_by=()):
+        self.model_label = model
+        self.field = field
+        self.source_label = source
+        self.links = links
+        self.condition = condition if condition is not None else Q()
+        self.aggregate = aggregate
+        self.changed_by = list(changed_by)
+
+    def __str__(self):
+        return f'{self.model_label}.{self.field}'
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def source(self):
+        return apps.get_model(self.source_label)
+
+    @property
+    def sources(self):
+        """[(源表标签, links)]：源表本身和 changed_by 中会改变该计数的表"""
+        return [(self.source_label, self.links), *self.changed_by]
+
+    def change_sources(self):
+        """增量核对时要查看的 [(源表模型, 变化时间列, links)]"""
+        return [
+            (apps.get_model(label), SOURCE_CHANGED_FIELDS[label], links)
+            for label, links in self.sources
+        ]
+
+    @property
+    def kind(self):
+        return self.aggregate if self.aggregate == 'count' else self.aggregate[0]
+
+    @property
+    def default(self):
+        """没有任何源记录时的应有值"""
+        return None if self.kind == 'max' else 0
+
+    def source_queryset(self):
+        return self.source.objects.filter(self.condition).order_by()
+
+    def aggregate_expression(self):
+        if self.kind == 'count':
+            return Count('pk')
+        _, field = self.aggregate
+        return Sum(field) if self.kind == 'sum' else Max(field)
+
+    def subquery(self):
+        """与目标行关联的相关子查询"""
+        group_by = list(self.links)
+        queryset = self.source_queryset().filter(
+            **{source_field: OuterRef(target_field) for source_field, target_field in self.links.items()}
+        ).values(*group_by).annotate(value=self.aggregate_expression()).values('value')
+        if self.default is not None:
+            return Coalesce(Subquery(queryset), Value(self.default))
+        return Subquery(queryset)
+
+
+# 源表 -> 行变化时间列（点赞、关注等关系表只有创建时间，删除无法从时间上看出）；
+# 用 F() 只更新计数列的写入不会刷新 auto_now，这些写入需要同时写变化时间列
+# （如发帖、评论时更新 TiebaMember 的计数同时刷新 last_active_at）
+SOURCE_CHANGED_FIELDS = {
+    'comments.Comment': 'updated_at',
+    'comments.CommentLike': 'created_at',
+    'posts.Post': 'updated_at',
+    'posts.PostLike': 'created_at',
+    'posts.PostCollect': 'created_at',
+    'tiebas.Tieba': 'updated_at',
+    'tiebas.TiebaMember': 'last_active_at',
+    'users.UserFollow': 'created_at',
+}
+
+
+COUNTERS = [
+    # 帖子
+    CounterSpec('posts.Post', 'reply_count', 'comments.Comment', {'post': 'pk'}, ~Q(status=2)),
+    CounterSpec('posts.Post', 'like_count', 'posts.PostLike', {'post': 'pk'}),
+    CounterSpec('posts.Post', 'collect_count', 'posts.PostCollect', {'post': 'pk'}),
+    CounterSpec('posts.Post', 'last_reply_at', 'comments.Comment', {'post': 'pk'}, ~Q(status=2),
+                aggregate=('max', 'created_at')),
+    # 评论
+    CounterSpec('comments.Comment', 'like_count', 'comments.CommentLike', {'comment': 'pk'}),
+    CounterSpec('comments.Comment', 'reply_count', 'comments.Comment', {'parent': 'pk'}, ~Q(status=2)),
+    # 贴吧
+    CounterSpec('tiebas.Tieba', 'member_count', 'tiebas.TiebaMember', {'tieba': 'pk'}, Q(status=1)),
+    CounterSpec('tiebas.Tieba', 'post_count', 'posts.Post', {'tieba': 'pk'}, ~Q(status=4)),
+    # 贴吧分类（成员数依赖上面贴吧的成员数，顺序不能颠倒；
+    # 贴吧成员数用 F() 更新，不改变贴吧的 updated_at，按成员表的变化找出受影响的分类）
+    CounterSpec('tiebas.TiebaCategory', 'tieba_count', 'tiebas.Tieba', {'category': 'pk'}, Q(status=1)),
+    CounterSpec('tiebas.TiebaCategory', 'member_count', 'tiebas.Tieba', {'category': 'pk'}, Q(status=1),
+                aggregate=('sum', 'member_count'),
+                changed_by=[('tiebas.TiebaMember', {'tieba__category': 'pk'})]),
+    # 贴吧成员
+    CounterSpec('tiebas.TiebaMember', 'post_count', 'posts.Post',
+                {'author': 'user', 'tieba': 'tieba'}, ~Q(status=4)),
+    CounterSpec('tiebas.TiebaMember', 'comment_count', 'comments.Comment',
+                {'author': 'user', 'post__tieba': 'tieba'}, ~Q(status=2)),
+    # 用户
+    CounterSpec('users.User', 'post_count', 'posts.Post', {'author': 'pk'}, ~Q(status=4)),
+    CounterSpec('users.User', 'comment_count', 'comments.Comment', {'author': 'pk'}, ~Q(status=2)),
+    CounterSpec('users.User', 'follower_count', 'users.UserFollow', {'following': 'pk'}),
+    CounterSpec('users.User', 'following_count', 'users.UserFollow', {'follower': 'pk'}),
+]
+
+
+def get_counters(model_labels=None):
+    """按模型筛选计数定义，model_labels 为空时返回全部"""
+    if not model_labels:
+        return list(COUNTERS)
+    labels = {label.lower() for label in model_labels}
+    return [spec for spec in COUNTERS if spec.model_label.lower() in labels]
+
+
+def recount_next_floor(chunk_size=10000, pk_min=None, pk_max=None):
+    """按已有顶级评论的最大楼层初始化 Post.next_floor
+
+    只会调大不会调小，运行期间新领取的楼层号不受影响。
+    """
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    max_floor = Comment.objects.filter(
+        post=OuterRef('pk'), parent__isnull=True
+    ).order_by().values('post').annotate(value=Max('floor_number')).values('value')
+    updated = 0
+    for start, end in pk_chunks(Post, chunk_size, pk_min, pk_max):
+        updated += Post.objects.filter(pk__gte=start, pk__lt=end).update(
+            next_floor=Greatest(F('next_floor'), Coalesce(Subquery(max_floor), Value(0)) + 1)
+        )
+    return updated
+
+
+def affected_pk_range(target_label, sources, pk_ranges):
+    """批量写入后计数可能变化的目标行主键区间 (pk_min, pk_max)，没有受影响的行时返回 None
+
+    pk_ranges 为 {模型标签: (最小主键, 最大主键)}，即本次写入的各表主键区间；
+    sources 为 [(源表标签, links)]（见 CounterSpec.sources）。
+    目标表自身新写入的行，以及源表新写入的行关联到的目标行都算受影响。
+    """
+    target = apps.get_model(target_label)
+    bounds = []
+    if target_label in pk_ranges:
+        bounds.append(pk_ranges[target_label])
+    for label, links in sources:
+        if label not in pk_ranges:
+            continue
+        low, high = pk_ranges[label]
+        written = apps.get_model(label).objects.filter(pk__gte=low, pk__lte=high).order_by()
+        touched = target.objects.filter(**{
+            f'{target_field}__in': written.values(source_field)
+            for source_field, target_field in links.items()
+        }).order_by().aggregate(low=Min('pk'), high=Max('pk'))
+        if touched['low'] is not None:
+            bounds.append((touched['low'], touched['high']))
+    if not bounds:
+        return None
+    return min(low for low, _ in bounds), max(high for _, high in bounds)
+
+
+def rebuild_comment_paths(stdout=None):
+    """为还没有路径的回复填写 Comment.path / depth
+
+    每轮用一条 UPDATE 处理父评论路径已就绪的一层回复，轮数等于最大回复层级；
+    已有路径的评论不会被改动，可以反复执行（批量导入后补齐）。返回更新行数。
+    """
+    Comment = apps.get_model('comments', 'Comment')
+    parent = Comment.objects.filter(pk=OuterRef('parent_id'))
+    pending = Comment.objects.filter(parent__isnull=False, path='').filter(
+        Q(parent__parent__isnull=True) | ~Q(parent__path='')
+    )
+    total = 0
+    level = 0
+    while True:
+        updated = pending.update(
+            path=Concat(
+                Subquery(parent.values('path')), Cast('parent_id', CharField()), Value('/'),
+                output_field=CharField(),
+            ),
+            depth=Subquery(parent.values('depth')) + 1,
+        )
+        if not updated:
+            return total
+        total += updated
+        level += 1
+        if stdout is not None:
+            stdout.write(f'第 {level} 轮: {updated} 条回复')
+
+
+def pk_chunks(model, chunk_size, pk_min=None, pk_max=None):
+    """把主键区间切成 [start, end) 的小块，未指定区间时取整张表"""
+    if pk_min is None or pk_max is None:
+        bounds = model.objects.order_by().aggregate(low=Min('pk'), high=Max('pk'))
+        pk_min = bounds['low'] if pk_min is None else pk_min
+        pk_max = bounds['high'] if pk_max is None else pk_max
+    if pk_min is None or pk_max is None:
+        return
+    start = pk_min
+    while start <= pk_max:
+        # 最后一块截到 pk_max，只给了一个小区间时不会碰到区间外的行
+        end = min(start + chunk_size, pk_max + 1)
+        yield start, end
+        start = end
+
+
+def recount(specs=None, chunk_size=10000, pk_min=None, pk_max=None, stdout=None):
+    """重新计算计数字段，返回 {计数名: 更新行数}
+
+    pk_min/pk_max 限定目标表的主键区间（闭区间），用于只处理新导入的数据。
+    """
+    results = {}
+    for spec in specs or COUNTERS:
+        model = spec.model
+        updated = 0
+        for start, end in pk_chunks(model, chunk_size, pk_min, pk_max):
+            updated += model.objects.filter(pk__gte=start, pk__lt=end).update(
+                **{spec.field: spec.subquery()}
+            )
+        results[str(spec)] = updated
+        if stdout is not None:
+            stdout.write(f'{spec}: {updated} 行')
+    return results
+
+
+class Drift:
+    """一个计数字段的核对结果"""
+
+    def __init__(self, spec, sample_size=10):
+        self.spec = spec
+        self.sample_size = sample_size
+        self.checked = 0
+        self.drifted = 0
+        self.repaired = 0
+        self.samples = []
+
+    def __str__(self):
+        text = f'{self.spec}: 核对 {self.checked} 行，偏差 {self.drifted} 行'
+        if self.repaired:
+            text += f'，已修复 {self.repaired} 行'
+        return text
+
+
+def _reconcile_targets(spec, targets, drift, repair):
+    """比对一批目标行（已按主键或关联键筛选）的当前值与应有值"""
+    target_fields = list(spec.links.values())
+    rows = list(targets.values(*dict.fromkeys(['pk', *target_fields, spec.field])))
+    if not rows:
+        return
+    # 源表按目标行涉及的关联值过滤后分组聚合，一条查询算出整批应有值
+    source = spec.source_queryset().filter(**{
+        f'{source_field}__in': {row[target_field] for row in rows}
+        for source_field, target_field in spec.links.items()
+    })
+    expected = {
+        tuple(row[source_field] for source_field in spec.links): row['value']
+        for row in source.values(*spec.links).annotate(value=spec.aggregate_expression())
+    }
+
+    drifted_pks = []
+    for row in rows:
+        value = expected.get(tuple(row[target_field] for target_field in target_fields), spec.default)
+        if row[spec.field] != value:
+            drifted_pks.append(row['pk'])
+            if len(drift.samples) < drift.sample_size:
+                drift.samples.append((row['pk'], row[spec.field], value))
+    drift.checked += len(rows)
+    drift.drifted += len(drifted_pks)
+
+    # 修复时在 UPDATE 语句内重新计算，不会用读出的旧值覆盖期间发生的并发增减
+    if repair and drifted_pks:
+        drift.repaired += spec.model.objects.filter(pk__in=drifted_pks).update(
+            **{spec.field: spec.subquery()}
+        )
+
+
+def _changed_target_batches(spec, since, batch_size):
+    """增量核对：按批产生 since 之后源表有变化的目标行查询集"""
+    target_fields = list(spec.links.values())
+
+    def targets(batch):
+        if target_fields == ['pk']:
+            return spec.model.objects.filter(pk__in=[key[0] for key in batch])
+        condition = Q()
+        for key in batch:
+            condition |= Q(**dict(zip(target_fields, key)))
+        return spec.model.objects.filter(condition)
+
+    batch = []
+    for source, changed_field, links in spec.change_sources():
+        # 按目标字段的顺序取出各源表的关联值
+        source_fields = {target: source_field for source_field, target in links.items()}
+        keys = source.objects.filter(
+            **{f'{changed_field}__gte': since}
+        ).order_by().values_list(*[source_fields[target] for target in target_fields]).distinct()
+        for key in keys.iterator(chunk_size=batch_size):
+            if any(value is None for value in key):
+                continue
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield targets(batch)
+                batch = []
+    if batch:
+        yield targets(batch)
+
+
+def reconcile(specs=None, chunk_size=10000, since=None, repair=False, sample_size=10, stdout=None):
+    """核对计数字段，返回 {计数名: Drift}
+
+    since 为空时按目标表主键区间分块全量核对；否则只核对 since 之后
+    源表有新增或修改的目标行。repair=True 时修复有偏差的行。
+    每块的查询和修复都是单独的短语句，不会长时间锁表。
+    """
+    results = {}
+    for spec in specs or COUNTERS:
+        drift = Drift(spec, sample_size)
+        if since is None:
+            batches = (
+                spec.model.objects.filter(pk__gte=start, pk__lt=end)
+                for start, end in pk_chunks(spec.model, chunk_size)
+            )
+        else:
+            # 多列关联时按 OR 条件定位目标行，批次取小一些
+            batch_size = chunk_size if len(spec.links) == 1 else min(chunk_size, 500)
+            batches = _changed_target_batches(spec, since, batch_size)
+        for targets in batches:
+            _reconcile_targets(spec, targets, drift, repair)
+        results[str(spec)] = drift
+        if stdout is not None:
+            stdout.write(str(drift))
+            for pk, current, expected in drift.samples:
+                stdout.write(f'    id={pk}: 当前 {current}，应为 {expected}')
+    return results
@@ -0,0 +1,113 @@
+"""
+计数原子更新的并发测试
+
+多个线程各自持有数据库连接同时写入，需要 TransactionTestCase（数据真正提交），
+SQLite 下测试库使用文件（见 settings 中的 DATABASES['default']['TEST']）。
+"""
+
+import threading
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from posts.models import Post, PostLike
+from tiebas.models import Tieba
+from users.models import User
+
+from .counters import increment, toggle_relation
+
+THREADS = 8
+
+
+def run_concurrently(target, args_list):
+    """每组参数一个线程，同时开始执行，返回各线程的结果（顺序与参数一致）"""
+    barrier = threading.Barrier(len(args_list))
+    results = [None] * len(args_list)
+    errors = []
+
+    def worker(index, args):
+        try:
+            barrier.wait()
+            results[index] = target(*args)
+        except Exception as exc:  # noqa: BLE001 - 交给主线程断言
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(args_list)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class CounterConcurrencyTests(TransactionTestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pw12345')
+        self.tieba = Tieba.objects.create(name='并发吧', owner=self.author, status=1)
+        self.post = Post.objects.create(
+            title='并发', content='并发测试', author=self.author, tieba=self.tieba, status=1
+        )
+
+    def test_increment_does_not_lose_updates(self):
+        per_thread = 20
+
+        def bump():
+            return [increment(Post, self.post.pk, 'view_count') for _ in range(per_thread)]
+
+        results = run_concurrently(bump, [()] * THREADS)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, THREADS * per_thread)
+        # 每次返回的都是本次更新后的值，互不重复
+        values = [value for values in results for value in values]
+        self.assertEqual(sorted(values), list(range(1, THREADS * per_thread + 1)))
+
+    def test_increment_missing_row(self):
+        self.assertIsNone(increment(Post, self.post.pk + 1000, 'view_count'))
+
+    def test_toggle_relation_same_user_counts_once(self):
+        def like():
+            return toggle_relation(
+                PostLike, {'user': self.author, 'post': self.post},
+                Post, self.post.pk, 'like_count', True
+            )
+
+        results = run_concurrently(like, [()] * THREADS)
+
+        self.assertEqual(sum(changed for changed, _ in results), 1)
+        self.assertEqual(PostLike.objects.filter(post=self.post).count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        results = run_concurrently(
+            lambda: toggle_relation(
+                PostLike, {'user': self.author, 'post': self.post},
+                Post, self.post.pk, 'like_count', False
+            ),
+            [()] * THREADS,
+        )
+
+        self.assertEqual(sum(changed for changed, _ in results), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_toggle_relation_many_users(self):
+        users = [User.objects.create_user(f'user{i}', password='pw12345') for i in range(THREADS)]
+
+        def like(user):
+            return toggle_relation(
+                PostLike, {'user': user, 'post': self.post},
+                Post, self.post.pk, 'like_count', True
+            )
+
+        results = run_concurrently(like, [(user,) for user in users])
+
+        self.assertTrue(all(changed for changed, _ in results))
+        self.assertEqual(sorted(count for _, count in results), list(range(1, THREADS + 1)))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, THREADS)
@@ -75,6 +75,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # 并发测试在多个线程中各自连接，内存数据库的共享缓存模式下写冲突不会等待锁，改用文件
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -146,6 +148,69 @@ AUTH_USER_MODEL = 'users.User'
 # Redis configuration (for caching and Celery)
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
+# Cache configuration（CACHE_BACKEND: locmem 本地内存 / redis）
+if config('CACHE_BACKEND', default='locmem') == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'tieba',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tieba',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# 贴吧帖子列表响应缓存时间（秒）
+POST_LIST_CACHE_TIMEOUT = config('POST_LIST_CACHE_TIMEOUT', default=300, cast=int)
+
+# 用户贴吧成员关系缓存时间（秒），成员变动时会主动失效；缓存后端不跨进程共享时不缓存
+TIEBA_MEMBERSHIP_CACHE_TIMEOUT = config('TIEBA_MEMBERSHIP_CACHE_TIMEOUT', default=3600, cast=int)
+
+# 缓存后端不跨进程共享（locmem）时，主动失效只作用于当前进程，
+# 详情接口的 ETag 每隔该秒数强制变化一次，其他进程最多返回这么久的旧 304；
+# 多进程部署请使用 CACHE_BACKEND=redis
+LOCAL_CACHE_STALE_TIMEOUT = config('LOCAL_CACHE_STALE_TIMEOUT', default=30, cast=int)
+
+# 首页推荐贴吧、贴吧分类快照的刷新间隔（秒），内容变化时会主动失效
+TIEBA_LISTING_CACHE_TIMEOUT = config('TIEBA_LISTING_CACHE_TIMEOUT', default=300, cast=int)
+
+# 贴吧名称自动补全的进程内索引定期从数据库重建的间隔（秒），本进程内的改动即时生效
+TIEBA_AUTOCOMPLETE_REFRESH = config('TIEBA_AUTOCOMPLETE_REFRESH', default=600, cast=int)
+
+# 帖子浏览数写缓冲（BACKEND: local 进程内 / cache 共享缓存，多进程部署需配合 CACHE_BACKEND=redis）
+VIEW_COUNT_BUFFER = {
+    'BACKEND': config('VIEW_COUNT_BACKEND', default='local'),
+    'CACHE_ALIAS': 'default',
+    'FLUSH_INTERVAL': config('VIEW_COUNT_FLUSH_INTERVAL', default=10, cast=int),  # 秒
+    'FLUSH_THRESHOLD': config('VIEW_COUNT_FLUSH_THRESHOLD', default=100, cast=int),
+}
+
+# 帖子全文检索后端，留空时 SQLite 使用 FTS5，其他数据库退回 icontains
+POST_SEARCH_BACKEND = config('POST_SEARCH_BACKEND', default='')
+
+# 图片衍生图（缩略图/中图）生成
+IMAGE_DERIVATIVES = {
+    'ASYNC': config('IMAGE_DERIVATIVES_ASYNC', default=True, cast=bool),
+    'WORKERS': config('IMAGE_DERIVATIVES_WORKERS', default=2, cast=int),
+    'SIZES': {'thumbnail': 240, 'medium': 960},  # 最长边像素
+    'FORMAT': 'WEBP',  # Pillow 不支持 WebP 时自动改用 JPEG
+    'QUALITY': 80,
+}
+
+# 评论列表中每层楼预加载的回复条数，其余回复通过 replies 接口分页获取
+COMMENT_REPLY_PREVIEW_SIZE = config('COMMENT_REPLY_PREVIEW_SIZE', default=3, cast=int)
+
+# 计数核对（reconcile_counters --incremental）记录上次运行时间的文件
+COUNTER_RECONCILE_STATE_FILE = config(
+    'COUNTER_RECONCILE_STATE_FILE', default=str(BASE_DIR / 'counter_reconcile_state.json')
+)
+
 # Celery configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PostsConfig(AppConfig):
+    name = 'posts'
+    verbose_name = '帖子'
+
+    def ready(self):
+        from . import signals  # noqa: F401
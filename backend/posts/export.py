@@ -0,0 +1,75 @@
+"""
+帖子整楼导出（NDJSON）
+
+先输出帖子，再按ID顺序输出全部评论和回复，每行一条记录，
+格式与 load_content --ndjson 的输入一致（type 字段 + 数据库列）。
+评论用 values().iterator(chunk_size) 分块读取并边读边写，
+不实例化模型、不经过序列化器，内存占用与楼层数无关。
+"""
+
+import datetime
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from comments.models import Comment
+
+from .models import Post
+
+# 输出缓冲达到该字节数时才交给响应/文件，避免逐行写出
+FLUSH_BYTES = 64 * 1024
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """时间保留完整微秒（DjangoJSONEncoder 会截断到毫秒），导出后再导入时间不变"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def iter_thread_records(post_id, include_hidden=False, chunk_size=2000):
+    """依次产生帖子和它的全部评论（dict）；include_hidden 时包含待审核和已删除的评论"""
+    post = Post.objects.filter(pk=post_id).values(*_columns(Post)).first()
+    if post is None:
+        return
+    yield {'type': 'post', **post}
+
+    comments = Comment.objects.filter(post_id=post_id)
+    if not include_hidden:
+        comments = comments.filter(status=1)
+    # 按ID输出保证父评论先于回复，导入时外键可以直接引用
+    for row in comments.order_by('id').values(*_columns(Comment)).iterator(chunk_size=chunk_size):
+        yield {'type': 'comment', **row}
+
+
+def iter_ndjson(records):
+    """把记录编码为 NDJSON 字节块"""
+    buffer = []
+    size = 0
+    for record in records:
+        line = (json.dumps(record, cls=ExportJSONEncoder, ensure_ascii=False) + '\n').encode('utf-8')
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_gzip(chunks, level=6):
+    """边读边压缩为 gzip 流"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,25 @@
+"""
+当前用户互动状态的批量加载
+
+列表/详情序列化前一次性查出整页帖子的点赞、收藏状态，
+序列化器从上下文中的集合读取，不再逐条查询。
+"""
+
+from .models import PostLike, PostCollect
+
+
+def get_post_interaction_state(user, post_ids):
+    """返回用户对给定帖子的点赞/收藏ID集合，每种关系一次查询"""
+    post_ids = list(post_ids)
+    if not user or not user.is_authenticated or not post_ids:
+        return {'liked_post_ids': set(), 'collected_post_ids': set()}
+    return {
+        'liked_post_ids': set(
+            PostLike.objects.filter(user=user, post_id__in=post_ids)
+            .values_list('post_id', flat=True)
+        ),
+        'collected_post_ids': set(
+            PostCollect.objects.filter(user=user, post_id__in=post_ids)
+            .values_list('post_id', flat=True)
+        ),
+    }
@@ -0,0 +1,94 @@
+"""
+贴吧帖子列表的响应缓存
+
+缓存键包含贴吧的版本号：发帖、删帖、置顶/加精、新回复时只需把该贴吧的版本号加一，
+旧版本的缓存自然失效，无需扫描或删除键。
+缓存的响应体不含 is_liked/is_collected 等与当前用户相关的字段，
+命中后再按当前用户批量补上，因此同一份缓存可以服务所有用户。
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .interactions import get_post_interaction_state
+
+# 与当前用户相关、不能进入共享缓存的字段
+PER_USER_FIELDS = ('is_liked', 'is_collected')
+
+# 参与缓存键计算的查询参数，其余参数（如 search、author_id）不走缓存
+KEY_PARAMS = (
+    'tieba_id', 'page', 'page_size', 'cursor', 'pagination', 'ordering',
+    'fields', 'exclude', 'expand', 'image_size',
+)
+UNCACHED_PARAMS = ('search', 'author_id', 'status')
+
+
+def _version_key(tieba_id):
+    return f'post_list_version:{tieba_id}'
+
+
+def get_version(tieba_id):
+    version = cache.get(_version_key(tieba_id))
+    if version is None:
+        cache.add(_version_key(tieba_id), 1, None)
+        version = cache.get(_version_key(tieba_id), 1)
+    return version
+
+
+def bump_version(tieba_id):
+    """使该贴吧的帖子列表缓存全部失效"""
+    key = _version_key(tieba_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 版本号不存在（过期或从未写入）时从 2 开始，避免与旧缓存撞键
+        cache.set(key, 2, None)
+
+
+def cache_key(request):
+    """请求对应的缓存键，不可缓存时返回 None"""
+    params = request.query_params
+    tieba_id = params.get('tieba_id')
+    if not tieba_id or any(params.get(name) for name in UNCACHED_PARAMS):
+        return None
+    viewer = 'auth' if request.user.is_authenticated else 'anon'
+    parts = [request.get_host()] + [f'{name}={params.get(name, "")}' for name in KEY_PARAMS]
+    digest = hashlib.md5('&'.join(parts).encode('utf-8')).hexdigest()
+    return f'post_list:{tieba_id}:v{get_version(tieba_id)}:{viewer}:{digest}'
+
+
+def _strip(data):
+    """去掉与当前用户相关的字段，得到可共享的响应体"""
+    data = dict(data)
+    data['results'] = [
+        {key: value for key, value in item.items() if key not in PER_USER_FIELDS}
+        for item in data['results']
+    ]
+    return data
+
+
+def get_cached(key, user, fields=None):
+    """读取缓存并补上当前用户的点赞/收藏状态
+
+    fields 为本次请求的字段集（None 表示全部），未请求的用户字段不补。
+    """
+    data = cache.get(key)
+    if data is None:
+        return None
+    wanted = [name for name in PER_USER_FIELDS if fields is None or name in fields]
+    if not wanted:
+        return data
+    state = get_post_interaction_state(user, [item['id'] for item in data['results']])
+    for item in data['results']:
+        if 'is_liked' in wanted:
+            item['is_liked'] = item['id'] in state['liked_post_ids']
+        if 'is_collected' in wanted:
+            item['is_collected'] = item['id'] in state['collected_post_ids']
+    return data
+
+
+def set_cached(key, data):
+    timeout = getattr(settings, 'POST_LIST_CACHE_TIMEOUT', 300)
+    cache.set(key, _strip(data), timeout)
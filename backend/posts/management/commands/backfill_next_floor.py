@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from common.recount import recount_next_floor
+
+
+class Command(BaseCommand):
+    """按已有评论初始化帖子的 next_floor 楼层计数"""
+
+    help = '按已有顶级评论的最大楼层初始化 Post.next_floor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='每次 UPDATE 处理的帖子ID区间大小')
+
+    def handle(self, *args, **options):
+        updated = recount_next_floor(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已处理 {updated} 个帖子'))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Value
+
+from comments.models import Comment
+from posts.models import Post
+from tiebas.models import Tieba, TiebaMember
+from tiebas.search import TiebaSearchResults
+
+
+def hot_queries():
+    """与各视图过滤条件一致的热点查询，及其应当使用的索引"""
+    return [
+        (
+            '贴吧帖子列表',
+            Post.objects.filter(status=1, tieba_id=1).order_by('-is_top', '-created_at', '-id'),
+            'post_tieba_list_idx',
+        ),
+        (
+            '全站帖子列表',
+            Post.objects.filter(status=1).order_by('-is_top', '-created_at', '-id'),
+            'post_list_idx',
+        ),
+        (
+            '作者帖子列表',
+            Post.objects.filter(status=1, author_id=1).order_by('-created_at'),
+            'post_author_idx',
+        ),
+        (
+            '帖子楼层列表',
+            Comment.objects.filter(status=1, post_id=1, parent__isnull=True).order_by('floor_number'),
+            'comment_thread_idx',
+        ),
+        (
+            '楼中楼回复',
+            Comment.objects.filter(status=1, parent_id=1).order_by('created_at'),
+            'comment_replies_idx',
+        ),
+        (
+            '整个对话',
+            Comment.objects.filter(status=1, path__gte='1/', path__lt='10').order_by('created_at', 'id'),
+            'comment_path_idx',
+        ),
+        (
+            '贴吧成员列表',
+            TiebaMember.objects.filter(status=1, tieba_id=1).order_by('-role', '-post_count', '-id'),
+            'tieba_member_list_idx',
+        ),
+        (
+            '贴吧发帖排行',
+            TiebaMember.objects.filter(status=1, tieba_id=1, post_count__gt=0).order_by('-post_count', '-id'),
+            'tieba_member_posts_idx',
+        ),
+        (
+            '贴吧评论排行',
+            TiebaMember.objects.filter(status=1, tieba_id=1, comment_count__gt=0).order_by('-comment_count', '-id'),
+            'tieba_member_comments_idx',
+        ),
+        (
+            '推荐贴吧',
+            Tieba.objects.filter(status=1, is_recommended=Value(True)).order_by('-member_count'),
+            'tieba_recommended_idx',
+        ),
+        (
+            '贴吧检索',
+            TiebaSearchResults('贴吧', Tieba.objects.filter(status=1)).token_queryset(),
+            'tieba_search_rank_idx',
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    """检查热点查询的执行计划是否使用了对应索引"""
+
+    help = '检查热点查询的 EXPLAIN 执行计划是否使用了对应索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plan', action='store_true', help='输出完整执行计划')
+
+    def handle(self, *args, **options):
+        missing = []
+        for label, queryset, index_name in hot_queries():
+            plan = queryset[:20].explain()
+            if index_name in plan:
+                self.stdout.write(self.style.SUCCESS(f'[OK] {label}: {index_name}'))
+            else:
+                missing.append(label)
+                self.stdout.write(self.style.ERROR(f'[MISSING] {label}: 未使用 {index_name}'))
+            if options['verbose_plan']:
+                self.stdout.write(plan)
+
+        if missing:
+            raise CommandError(f'{len(missing)} 个查询未使用预期索引: {", ".join(missing)}')
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import iter_gzip, iter_ndjson, iter_thread_records
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """以 NDJSON 导出整楼（帖子 + 全部评论和回复）"""
+
+    help = '以 NDJSON 流式导出帖子及其全部评论，输出可直接用 load_content --ndjson 导入'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_id', type=int)
+        parser.add_argument('--output', '-o', help='输出文件，默认写到标准输出')
+        parser.add_argument('--gzip', action='store_true', help='gzip 压缩输出')
+        parser.add_argument('--include-hidden', action='store_true', help='包含待审核和已删除的评论')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每次从数据库读取的行数')
+
+    def handle(self, *args, **options):
+        if not Post.objects.filter(pk=options['post_id']).exists():
+            raise CommandError(f'帖子 {options["post_id"]} 不存在')
+
+        chunks = iter_ndjson(iter_thread_records(
+            options['post_id'], include_hidden=options['include_hidden'], chunk_size=options['chunk_size']
+        ))
+        if options['gzip']:
+            chunks = iter_gzip(chunks)
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
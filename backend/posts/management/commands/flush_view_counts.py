@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.view_counter import get_view_count_buffer
+
+
+class Command(BaseCommand):
+    """把浏览数写缓冲中的增量写回数据库"""
+
+    help = '把浏览数写缓冲中的增量写回数据库'
+
+    def handle(self, *args, **options):
+        updated = get_view_count_buffer().flush()
+        self.stdout.write(self.style.SUCCESS(f'已写回 {updated} 个帖子的浏览数'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from comments.models import CommentImage
+from common.images import generate_derivatives
+from posts.models import PostImage
+
+
+class Command(BaseCommand):
+    """为尚未生成衍生图的帖子/评论图片补生成缩略图和中图"""
+
+    help = '为帖子/评论图片补生成缩略图和中图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新生成全部图片的衍生图')
+
+    def handle(self, *args, **options):
+        for model, label in ((PostImage, 'posts.PostImage'), (CommentImage, 'comments.CommentImage')):
+            queryset = model.objects.all()
+            if not options['all']:
+                queryset = queryset.filter(renditions={})
+            done = 0
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                if generate_derivatives(label, pk) is not None:
+                    done += 1
+            self.stdout.write(self.style.SUCCESS(f'{label}: 已生成 {done} 张图片的衍生图'))
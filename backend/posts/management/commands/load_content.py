@@ -0,0 +1,413 @@
+"""
+批量导入/生成贴吧内容
+
+    # 从 NDJSON 导入（每行一条记录，type 字段指明类型）
+    python manage.py load_content --ndjson dump.ndjson
+
+    # 从 CSV 导入（一个文件一种类型，表头即字段名）
+    python manage.py load_content --csv comments.csv --type comment
+
+    # 生成测试数据
+    python manage.py load_content --synthetic --users 10000 --tiebas 1000 \\
+        --posts 1000000 --comments 10000000 --post-likes 2000000
+
+记录直接携带主键和外键ID（如 id、tieba_id、author_id），按批 bulk_create 写入，
+每批一个事务；全部写完后用集合式 UPDATE 重新计算冗余计数，
+只处理本次写入的记录涉及的目标行主键区间，不重算整张表。
+"""
+
+import csv
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from common.recount import (
+    affected_pk_range, get_counters, rebuild_comment_paths, recount, recount_next_floor,
+)
+
+
+# 记录类型 -> 模型，按外键依赖顺序排列，写入时也按此顺序
+RECORD_TYPES = {
+    'user': 'users.User',
+    'tieba': 'tiebas.Tieba',
+    'member': 'tiebas.TiebaMember',
+    'post': 'posts.Post',
+    'comment': 'comments.Comment',
+    'post_like': 'posts.PostLike',
+    'post_collect': 'posts.PostCollect',
+    'comment_like': 'comments.CommentLike',
+}
+
+
+@contextmanager
+def preserve_timestamps(models):
+    """导入期间关闭 auto_now/auto_now_add，保留记录自带的时间"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class BulkWriter:
+    """按类型缓冲记录，攒满一批后在一个事务内按依赖顺序 bulk_create"""
+
+    def __init__(self, batch_size, stdout=None):
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.models = {name: apps.get_model(label) for name, label in RECORD_TYPES.items()}
+        self.buffers = {name: [] for name in RECORD_TYPES}
+        self.pending = 0
+        self.counts = {name: 0 for name in RECORD_TYPES}
+        self.search_post_ids = []
+        # 各类型写入的主键区间 {类型: (最小, 最大)}；bulk_create 拿不到主键时（如 MySQL）记为未知
+        self.pk_ranges = {}
+        self.unknown_pks = False
+        # 在关闭 auto_now 之前记下各模型的自动时间字段
+        self.timestamp_fields = {
+            name: [
+                field.attname for field in model._meta.concrete_fields
+                if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+            ]
+            for name, model in self.models.items()
+        }
+
+    def add(self, record_type, values):
+        model = self.models[record_type]
+        now = timezone.now()
+        # 未提供的时间字段按 auto_now 语义补当前时间
+        for attname in self.timestamp_fields[record_type]:
+            if values.get(attname) is None:
+                values[attname] = now
+        if record_type == 'user':
+            values.setdefault('password', '!')
+        elif record_type == 'post' and 'summary' not in values:
+            values['summary'] = model.build_summary(values.get('content'))
+        self.buffers[record_type].append(model(**values))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with transaction.atomic():
+            for record_type, objs in self.buffers.items():
+                if objs:
+                    self.models[record_type].objects.bulk_create(objs, batch_size=self.batch_size)
+                    self.counts[record_type] += len(objs)
+                    self.track_pks(record_type, [obj.pk for obj in objs])
+                    if record_type == 'post':
+                        self.search_post_ids.extend(obj.pk for obj in objs)
+        self.buffers = {name: [] for name in RECORD_TYPES}
+        self.pending = 0
+        if self.stdout is not None:
+            summary = ', '.join(f'{name}={count}' for name, count in self.counts.items() if count)
+            self.stdout.write(f'已写入: {summary}')
+
+    def track_pks(self, record_type, pks):
+        if None in pks:
+            self.unknown_pks = True
+            return
+        low, high = min(pks), max(pks)
+        if record_type in self.pk_ranges:
+            low = min(low, self.pk_ranges[record_type][0])
+            high = max(high, self.pk_ranges[record_type][1])
+        self.pk_ranges[record_type] = (low, high)
+
+
+def coerce_values(model, row):
+    """把 CSV/NDJSON 中的字符串值转换成字段类型，外键统一用 *_id"""
+    values = {}
+    for key, value in row.items():
+        if key == 'type' or value == '' or value is None:
+            continue
+        try:
+            field = model._meta.get_field(key)
+        except Exception:
+            raise CommandError(f'{model.__name__} 没有字段 {key}')
+        attname = field.attname
+        if field.get_internal_type() == 'DateTimeField' and isinstance(value, str):
+            value = parse_datetime(value)
+            if value is not None and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+        elif field.get_internal_type() == 'BooleanField' and isinstance(value, str):
+            value = value.lower() in ('1', 'true', 'yes')
+        else:
+            value = field.to_python(value)
+        values[attname] = value
+    return values
+
+
+class SyntheticGenerator:
+    """按长尾分布生成测试数据
+
+    贴吧热度、帖子热度服从帕累托分布（少数贴吧/帖子占大部分内容），
+    所有主键从当前最大ID之后顺序分配，外键直接引用，无需回查数据库。
+    """
+
+    def __init__(self, options, models, rng):
+        self.options = options
+        self.models = models
+        self.rng = rng
+        self.start_ids = {
+            name: (model.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+            for name, model in models.items()
+        }
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+
+    def _random_time(self):
+        return self.now - self.span * self.rng.random()
+
+    def _weights(self, n):
+        alpha = self.options['skew']
+        return [self.rng.paretovariate(alpha) for _ in range(n)]
+
+    def _pick(self, ids, weights, k):
+        return self.rng.choices(ids, cum_weights=weights, k=k)
+
+    def _cumulative(self, weights):
+        total = 0
+        result = []
+        for weight in weights:
+            total += weight
+            result.append(total)
+        return result
+
+    def records(self):
+        opts = self.options
+        rng = self.rng
+
+        user_ids = list(range(self.start_ids['user'], self.start_ids['user'] + opts['users']))
+        for user_id in user_ids:
+            yield 'user', {
+                'id': user_id, 'username': f'seed_{user_id}', 'nickname': f'用户{user_id}',
+                'created_at': self._random_time(),
+            }
+        if not user_ids:
+            user_ids = list(self.models['user'].objects.values_list('pk', flat=True)[:100000])
+        if not user_ids:
+            raise CommandError('没有可用的用户，请指定 --users')
+
+        tieba_ids = list(range(self.start_ids['tieba'], self.start_ids['tieba'] + opts['tiebas']))
+        for tieba_id in tieba_ids:
+            yield 'tieba', {
+                'id': tieba_id, 'name': f'测试吧{tieba_id}', 'description': f'第 {tieba_id} 个测试贴吧',
+                'owner_id': rng.choice(user_ids), 'status': 1, 'created_at': self._random_time(),
+            }
+        if not tieba_ids:
+            raise CommandError('请通过 --tiebas 指定要生成的贴吧数量')
+
+        # 成员：每个贴吧的成员数与热度成正比，(user, tieba) 唯一
+        tieba_weights = self._weights(len(tieba_ids))
+        total_weight = sum(tieba_weights)
+        member_id = self.start_ids['member']
+        members = {}
+        for tieba_id, weight in zip(tieba_ids, tieba_weights):
+            size = max(1, min(len(user_ids), int(opts['members'] * weight / total_weight)))
+            members[tieba_id] = rng.sample(user_ids, size)
+            for index, user_id in enumerate(members[tieba_id]):
+                yield 'member', {
+                    'id': member_id, 'user_id': user_id, 'tieba_id': tieba_id,
+                    'role': 2 if index == 0 else 0, 'status': 1,
+                }
+                member_id += 1
+
+        tieba_cum = self._cumulative(tieba_weights)
+        post_ids = list(range(self.start_ids['post'], self.start_ids['post'] + opts['posts']))
+        for post_id, tieba_id in zip(post_ids, self._pick(tieba_ids, tieba_cum, len(post_ids))):
+            yield 'post', {
+                'id': post_id, 'title': f'测试帖子 {post_id}',
+                'content': f'这是测试帖子 {post_id} 的正文。' * rng.randint(1, 20),
+                'author_id': rng.choice(members[tieba_id]), 'tieba_id': tieba_id,
+                'status': 1, 'created_at': self._random_time(),
+            }
+        if not post_ids:
+            return
+
+        # 评论：热门帖子集中大部分回复，约 1/5 为楼中楼
+        post_cum = self._cumulative(self._weights(len(post_ids)))
+        floors = {}
+        top_level = {}
+        comment_id = self.start_ids['comment']
+        for post_id in self._pick(post_ids, post_cum, opts['comments']):
+            parents = top_level.setdefault(post_id, [])
+            parent = None
+            if parents and rng.random() < opts['reply_ratio']:
+                parent = rng.choice(parents)
+            if parent is None:
+                floors[post_id] = floors.get(post_id, 0) + 1
+                floor_number = floors[post_id]
+                # 每个帖子只保留最近若干楼作为楼中楼的候选，控制内存占用
+                parents.append((comment_id, floor_number))
+                if len(parents) > 50:
+                    parents.pop(0)
+                parent_id = None
+            else:
+                parent_id, floor_number = parent
+            yield 'comment', {
+                'id': comment_id, 'content': f'回复 {comment_id}',
+                'author_id': rng.choice(user_ids), 'post_id': post_id, 'parent_id': parent_id,
+                'floor_number': floor_number, 'status': 1, 'created_at': self._random_time(),
+            }
+            comment_id += 1
+
+        seen = set()
+        like_id = self.start_ids['post_like']
+        for post_id in self._pick(post_ids, post_cum, opts['post_likes']):
+            user_id = rng.choice(user_ids)
+            if (user_id, post_id) in seen:
+                continue
+            seen.add((user_id, post_id))
+            yield 'post_like', {'id': like_id, 'user_id': user_id, 'post_id': post_id}
+            like_id += 1
+
+
+class Command(BaseCommand):
+    """批量导入/生成贴吧、成员、帖子、评论和点赞数据"""
+
+    help = '从 NDJSON/CSV 批量导入，或生成测试数据；写入后重新计算冗余计数'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--ndjson', help='NDJSON 文件路径，每行需带 type 字段')
+        source.add_argument('--csv', help='CSV 文件路径，需配合 --type')
+        source.add_argument('--synthetic', action='store_true', help='生成测试数据')
+        parser.add_argument('--type', choices=list(RECORD_TYPES), help='CSV 文件的记录类型')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每个事务写入的记录数')
+        parser.add_argument('--skip-recount', action='store_true', help='写入后不重新计算计数')
+        parser.add_argument('--skip-search-index', action='store_true', help='写入后不更新帖子全文索引和贴吧检索词表')
+
+        synthetic = parser.add_argument_group('测试数据')
+        synthetic.add_argument('--users', type=int, default=0)
+        synthetic.add_argument('--tiebas', type=int, default=0)
+        synthetic.add_argument('--members', type=int, default=0, help='成员关系总数（近似）')
+        synthetic.add_argument('--posts', type=int, default=0)
+        synthetic.add_argument('--comments', type=int, default=0)
+        synthetic.add_argument('--post-likes', type=int, default=0)
+        synthetic.add_argument('--reply-ratio', type=float, default=0.2, help='楼中楼回复占比')
+        synthetic.add_argument('--skew', type=float, default=1.2, help='帕累托分布参数，越小越集中')
+        synthetic.add_argument('--days', type=int, default=365, help='时间跨度（天）')
+        synthetic.add_argument('--seed', type=int, default=None)
+
+    def read_ndjson(self, path):
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    raise CommandError(f'第 {line_number} 行不是合法的 JSON: {exc}')
+                record_type = row.get('type')
+                if record_type not in RECORD_TYPES:
+                    raise CommandError(f'第 {line_number} 行的 type 无效: {record_type}')
+                yield record_type, row
+
+    def read_csv(self, path, record_type):
+        if not record_type:
+            raise CommandError('导入 CSV 时必须指定 --type')
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield record_type, row
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        writer = BulkWriter(options['batch_size'], self.stdout)
+
+        if options['synthetic']:
+            rng = random.Random(options['seed'])
+            records = SyntheticGenerator(options, writer.models, rng).records()
+            convert = False
+        elif options['ndjson']:
+            records = self.read_ndjson(options['ndjson'])
+            convert = True
+        else:
+            records = self.read_csv(options['csv'], options['type'])
+            convert = True
+
+        with preserve_timestamps(writer.models.values()):
+            for record_type, row in records:
+                values = coerce_values(writer.models[record_type], row) if convert else row
+                writer.add(record_type, values)
+            writer.flush()
+        self.reset_sequences(writer)
+
+        # bulk_create 不经过 Comment.save，回复的物化路径需要补齐
+        if writer.counts.get('comment'):
+            self.stdout.write('补齐回复路径...')
+            rebuild_comment_paths()
+
+        if not options['skip_search_index'] and writer.search_post_ids:
+            self.update_search_index(writer.search_post_ids, options['batch_size'])
+
+        if not options['skip_recount']:
+            self.stdout.write('重新计算冗余计数...')
+            self.recount(writer)
+
+        # 贴吧检索词表在计数重算之后重建，成员数权重才准确
+        if not options['skip_search_index'] and writer.counts.get('tieba'):
+            self.stdout.write('重建贴吧检索词表...')
+            call_command('rebuild_tieba_search_index', stdout=self.stdout)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'完成，用时 {elapsed:.1f} 秒'))
+
+    def recount(self, writer):
+        """只重算本次写入涉及的目标行；有记录没拿到主键时整表重算"""
+        if writer.unknown_pks:
+            recount(get_counters(), stdout=self.stdout)
+            recount_next_floor()
+            return
+        pk_ranges = {
+            writer.models[record_type]._meta.label: bounds
+            for record_type, bounds in writer.pk_ranges.items()
+        }
+        # 逐个计数按定义顺序执行：贴吧分类的成员数依赖先重算的贴吧成员数
+        for spec in get_counters():
+            bounds = affected_pk_range(spec.model_label, spec.sources, pk_ranges)
+            if bounds is not None:
+                recount([spec], pk_min=bounds[0], pk_max=bounds[1], stdout=self.stdout)
+        bounds = affected_pk_range('posts.Post', [('comments.Comment', {'post': 'pk'})], pk_ranges)
+        if bounds is not None:
+            recount_next_floor(pk_min=bounds[0], pk_max=bounds[1])
+
+    def reset_sequences(self, writer):
+        """显式写入主键后重置自增序列（PostgreSQL 等需要）"""
+        models = [writer.models[name] for name, count in writer.counts.items() if count]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def update_search_index(self, post_ids, batch_size):
+        from posts.models import Post
+        from posts.search import get_search_backend
+
+        backend = get_search_backend()
+        for start in range(0, len(post_ids), batch_size):
+            chunk = post_ids[start:start + batch_size]
+            with transaction.atomic():
+                for post in Post.objects.filter(pk__in=chunk).only('id', 'title', 'content'):
+                    backend.index_post(post)
+        self.stdout.write(f'已更新 {len(post_ids)} 个帖子的全文索引')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """重建帖子全文索引"""
+
+    help = '重建帖子全文索引'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only('id', 'title', 'content').order_by('id').iterator(chunk_size=1000)
+        get_search_backend().rebuild(posts)
+        self.stdout.write(self.style.SUCCESS('帖子全文索引已重建'))
@@ -0,0 +1,89 @@
+"""
+核对冗余计数字段
+
+    # 全量核对并报告偏差
+    python manage.py reconcile_counters
+
+    # 只核对上次运行之后有变化的行，并修复偏差
+    python manage.py reconcile_counters --incremental --repair
+
+    # 只核对指定模型
+    python manage.py reconcile_counters --model users.User --model tiebas.TiebaMember
+"""
+
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from common.recount import get_counters, reconcile
+
+
+class Command(BaseCommand):
+    """核对冗余计数字段与源表是否一致"""
+
+    help = '分块核对冗余计数字段，报告偏差，可选修复；支持只核对上次运行之后变化的行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='只核对该模型的计数（如 posts.Post），可重复')
+        parser.add_argument('--repair', action='store_true', help='修复有偏差的行')
+        parser.add_argument('--incremental', action='store_true', help='只核对上次运行之后源表有变化的行')
+        parser.add_argument('--since', help='只核对该时间（ISO 格式）之后源表有变化的行')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='每块处理的目标行数')
+        parser.add_argument('--samples', type=int, default=10, help='每个计数最多列出多少条偏差明细')
+
+    def handle(self, *args, **options):
+        specs = get_counters(options['model'])
+        if not specs:
+            raise CommandError(f'没有匹配的计数定义: {options["model"]}')
+
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'无法解析时间: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        elif options['incremental']:
+            since = self.read_last_run()
+            if since is None:
+                self.stdout.write('没有上次运行记录，执行全量核对')
+
+        # 记录开始时间而不是结束时间，核对期间发生的变化留给下次运行
+        started_at = timezone.now()
+        mode = f'增量（{since.isoformat()} 之后）' if since else '全量'
+        self.stdout.write(f'{mode}核对 {len(specs)} 个计数...')
+        results = reconcile(
+            specs, chunk_size=options['chunk_size'], since=since, repair=options['repair'],
+            sample_size=options['samples'], stdout=self.stdout,
+        )
+
+        drifted = sum(drift.drifted for drift in results.values())
+        repaired = sum(drift.repaired for drift in results.values())
+
+        # 只有全部计数都核对过且没有遗留偏差时才推进上次运行时间，
+        # 否则下次增量核对会跳过这次发现但未修复的行；
+        # 手动指定 --since 的核对不影响定时任务的增量起点
+        if not options['model'] and not options['since'] and drifted == repaired:
+            self.write_last_run(started_at)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('所有计数一致'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'发现 {drifted} 行偏差，已修复 {repaired} 行'))
+        else:
+            self.stdout.write(self.style.WARNING(f'发现 {drifted} 行偏差，加 --repair 修复'))
+
+    def read_last_run(self):
+        path = settings.COUNTER_RECONCILE_STATE_FILE
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return parse_datetime(json.load(f).get('last_run', ''))
+
+    def write_last_run(self, started_at):
+        with open(settings.COUNTER_RECONCILE_STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'last_run': started_at.isoformat()}, f)
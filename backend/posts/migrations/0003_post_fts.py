@@ -0,0 +1,55 @@
+import re
+
+from django.db import migrations
+
+# 建表时的切词规则（posts.search.tokenize 的快照），迁移不随后续修改而变化
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """中日韩片段切成单字和二元组，其余按字母数字词切分并转小写"""
+    tokens = []
+    text = (text or '').lower()
+    pos = 0
+    for match in CJK_RE.finditer(text):
+        tokens.extend(WORD_RE.findall(text[pos:match.start()]))
+        run = match.group()
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        pos = match.end()
+    tokens.extend(WORD_RE.findall(text[pos:]))
+    return tokens
+
+
+def create_post_fts(apps, schema_editor):
+    """创建 FTS5 索引表并写入已有帖子（仅 SQLite）"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts "
+        "USING fts5(title, content, tokenize='unicode61')"
+    )
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.only('id', 'title', 'content').iterator(chunk_size=1000):
+        schema_editor.execute(
+            'INSERT INTO post_fts (rowid, title, content) VALUES (%s, %s, %s)',
+            [post.pk, ' '.join(tokenize(post.title)), ' '.join(tokenize(post.content))],
+        )
+
+
+def drop_post_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_post_fts, drop_post_fts),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+# 生成摘要的规则（Post.build_summary 的快照），迁移不随后续修改而变化
+SUMMARY_LENGTH = 100
+
+
+def build_summary(content):
+    text = ' '.join((content or '').split())
+    if len(text) > SUMMARY_LENGTH:
+        return text[:SUMMARY_LENGTH] + '…'
+    return text
+
+
+def fill_summary(apps, schema_editor):
+    """为已有帖子生成摘要"""
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=1000):
+        post.summary = build_summary(post.content)
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['summary'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='summary',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='摘要'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 16:36
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def init_next_floor(apps, schema_editor):
+    """按已有顶级评论的最大楼层初始化 next_floor（大表可改用 backfill_next_floor 命令分块执行）"""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    max_floor = Comment.objects.filter(
+        post=OuterRef('pk'), parent__isnull=True
+    ).order_by().values('post').annotate(value=Max('floor_number')).values('value')
+    Post.objects.update(next_floor=Coalesce(Subquery(max_floor), Value(0)) + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_summary'),
+        ('comments', '0003_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='next_floor',
+            field=models.IntegerField(default=1, verbose_name='下一楼层号'),
+        ),
+        migrations.RunPython(init_next_floor, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_next_floor'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_tieba_list_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_list_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_author_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'tieba', '-is_top', '-created_at', '-id'], name='post_tieba_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-is_top', '-created_at', '-id'], name='post_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'author', '-created_at'], name='post_author_idx'),
+        ),
+    ]
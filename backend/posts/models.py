@@ -15,6 +15,8 @@ class Post(models.Model):
     
     title = models.CharField('标题', max_length=255)
     content = models.TextField('内容')
+    # 正文摘要，列表接口只读这一列而不加载 content
+    summary = models.CharField('摘要', max_length=200, blank=True, default='')
     
     # 关联字段
     author = models.ForeignKey(
@@ -35,6 +37,8 @@ class Post(models.Model):
     reply_count = models.IntegerField('回复数', default=0)
     like_count = models.IntegerField('点赞数', default=0)
     collect_count = models.IntegerField('收藏数', default=0)
+    # 下一个可分配的楼层号，发表顶级评论时原子地领取
+    next_floor = models.IntegerField('下一楼层号', default=1)
     
     # 管理字段
     status = models.SmallIntegerField('状态', choices=STATUS_CHOICES, default=0)
@@ -51,9 +55,44 @@ class Post(models.Model):
         verbose_name = '帖子'
         verbose_name_plural = '帖子'
         ordering = ['-is_top', '-created_at']
+        indexes = [
+            # 贴吧帖子列表：status=1 AND tieba_id=? ORDER BY -is_top, -created_at, -id
+            models.Index(
+                fields=['status', 'tieba', '-is_top', '-created_at', '-id'],
+                name='post_tieba_list_idx',
+            ),
+            # 全站帖子列表
+            models.Index(
+                fields=['status', '-is_top', '-created_at', '-id'],
+                name='post_list_idx',
+            ),
+            # 按作者过滤的帖子列表
+            models.Index(
+                fields=['status', 'author', '-created_at'],
+                name='post_author_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
+    
+    SUMMARY_LENGTH = 100
+    
+    @classmethod
+    def build_summary(cls, content):
+        """由正文生成摘要：合并空白后截取前 SUMMARY_LENGTH 个字符"""
+        text = ' '.join((content or '').split())
+        if len(text) > cls.SUMMARY_LENGTH:
+            return text[:cls.SUMMARY_LENGTH] + '…'
+        return text
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.summary = self.build_summary(self.content)
+            if update_fields is not None and 'summary' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + ['summary']
+        super().save(*args, **kwargs)
 
 
 class PostImage(models.Model):
@@ -69,6 +108,11 @@ class PostImage(models.Model):
     description = models.CharField('描述', max_length=200, null=True, blank=True)
     sort_order = models.IntegerField('排序', default=0)
     
+    # 衍生图信息，由后台任务生成后写入
+    width = models.PositiveIntegerField('原图宽度', null=True, blank=True)
+    height = models.PositiveIntegerField('原图高度', null=True, blank=True)
+    renditions = models.JSONField('衍生图', default=dict, blank=True)
+    
     class Meta:
         db_table = 'post_image'
         verbose_name = '帖子图片'
@@ -0,0 +1,19 @@
+"""
+帖子列表分页
+
+PostCursorPagination 按 (is_top, created_at, id) 做键集分页：
+翻页条件直接落在排序列上，不产生 OFFSET 扫描，也不需要 COUNT(*)，
+第 5000 页和第 1 页的开销相同。置顶帖仍然排在最前。
+"""
+
+from datetime import datetime
+
+from common.pagination import KeysetCursorPagination
+
+
+class PostCursorPagination(KeysetCursorPagination):
+    """帖子键集（游标）分页"""
+
+    # 与 PostViewSet.get_queryset 的排序一致，id 保证排序键唯一
+    ordering = ('-is_top', '-created_at', '-id')
+    cursor_fields = (('is_top', bool), ('created_at', datetime), ('id', int))
@@ -0,0 +1,216 @@
+"""
+帖子全文检索
+
+后端通过 settings.POST_SEARCH_BACKEND 配置：
+- SQLiteFTSBackend：SQLite FTS5 倒排索引，中日韩文本按单字+二元组切分，bm25 排序
+- IContainsBackend：原有的 icontains 扫描，作为不支持 FTS5 的数据库的兜底
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+# 中日韩统一表意文字、假名、谚文
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text, for_query=False):
+    """切分文本
+
+    中日韩连续片段切成二元组（建索引时额外保留单字，以支持单字检索），
+    其余部分按字母数字词切分并转小写。
+    """
+    tokens = []
+    text = (text or '').lower()
+    pos = 0
+    for match in CJK_RE.finditer(text):
+        tokens.extend(WORD_RE.findall(text[pos:match.start()]))
+        run = match.group()
+        bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+        if for_query:
+            # 检索时二元组已足够，单字片段才退回单字
+            tokens.extend(bigrams or [run])
+        else:
+            tokens.extend(run)
+            tokens.extend(bigrams)
+        pos = match.end()
+    tokens.extend(WORD_RE.findall(text[pos:]))
+    return tokens
+
+
+class BaseSearchBackend:
+    """检索后端基类"""
+
+    def index_post(self, post):
+        """写入或更新帖子的索引"""
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        """删除帖子的索引"""
+        raise NotImplementedError
+
+    def rebuild(self, posts):
+        """重建全部索引"""
+        for post in posts:
+            self.index_post(post)
+
+    def count(self, query, filters=None):
+        """匹配的帖子总数"""
+        raise NotImplementedError
+
+    def search(self, query, filters=None, offset=0, limit=20):
+        """按相关度排序的帖子ID列表
+
+        filters 支持 tieba_id、author_id，只检索 status=1 的帖子。
+        """
+        raise NotImplementedError
+
+
+class IContainsBackend(BaseSearchBackend):
+    """icontains 全表扫描（兜底）"""
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def _queryset(self, query, filters):
+        from .models import Post
+
+        return Post.objects.filter(status=1, **(filters or {})).filter(
+            Q(title__icontains=query) | Q(content__icontains=query)
+        )
+
+    def count(self, query, filters=None):
+        return self._queryset(query, filters).count()
+
+    def search(self, query, filters=None, offset=0, limit=20):
+        queryset = self._queryset(query, filters).order_by('-created_at', '-id')
+        return list(queryset.values_list('id', flat=True)[offset:offset + limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 检索
+
+    post_fts 表的 rowid 即帖子ID，title/content 列存放 tokenize() 切分后
+    以空格连接的词，使用 unicode61 分词器原样建立倒排索引。
+    """
+
+    table = 'post_fts'
+    # bm25 列权重：标题命中比正文更重要
+    title_weight = 10.0
+    content_weight = 1.0
+    filter_columns = {'tieba_id': 'tieba_id', 'author_id': 'author_id'}
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)',
+                [post.pk, ' '.join(tokenize(post.title)), ' '.join(tokenize(post.content))],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def rebuild(self, posts):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        super().rebuild(posts)
+
+    def build_match(self, query):
+        """把用户输入转换为 FTS5 MATCH 表达式（各词之间为 AND）"""
+        tokens = tokenize(query, for_query=True)
+        return ' '.join('"%s"' % token.replace('"', '""') for token in tokens)
+
+    def _base_sql(self, match, filters):
+        where = [f'{self.table} MATCH %s', 'p.status = 1']
+        params = [match]
+        for key, value in (filters or {}).items():
+            where.append(f'p.{self.filter_columns[key]} = %s')
+            params.append(value)
+        sql = (
+            f'FROM {self.table} JOIN post p ON p.id = {self.table}.rowid '
+            f'WHERE {" AND ".join(where)}'
+        )
+        return sql, params
+
+    def count(self, query, filters=None):
+        match = self.build_match(query)
+        if not match:
+            return 0
+        base_sql, params = self._base_sql(match, filters)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) {base_sql}', params)
+            return cursor.fetchone()[0]
+
+    def search(self, query, filters=None, offset=0, limit=20):
+        match = self.build_match(query)
+        if not match:
+            return []
+        base_sql, params = self._base_sql(match, filters)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT p.id {base_sql} '
+                f'ORDER BY bm25({self.table}, %s, %s), p.id DESC LIMIT %s OFFSET %s',
+                params + [self.title_weight, self.content_weight, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SearchResults:
+    """检索结果的惰性序列
+
+    实现 count() 与切片，可直接交给 Django Paginator / DRF 分页器：
+    只查询总数和当前页的帖子ID，再按相关度顺序加载这一页的帖子。
+    """
+
+    def __init__(self, backend, query, queryset, filters=None):
+        self.backend = backend
+        self.query = query
+        self.queryset = queryset
+        self.filters = filters or {}
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query, self.filters)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        limit = (key.stop if key.stop is not None else self.count()) - offset
+        if limit <= 0:
+            return []
+        ids = self.backend.search(self.query, self.filters, offset=offset, limit=limit)
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+_backend = None
+
+
+def get_search_backend():
+    """获取 settings.POST_SEARCH_BACKEND 配置的检索后端"""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'POST_SEARCH_BACKEND', None)
+        if not backend_path:
+            backend_path = (
+                'posts.search.SQLiteFTSBackend' if connection.vendor == 'sqlite'
+                else 'posts.search.IContainsBackend'
+            )
+        _backend = import_string(backend_path)()
+    return _backend
@@ -1,7 +1,24 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Post, PostImage, PostLike, PostCollect
 from users.models import User
-from tiebas.models import Tieba
+from tiebas.activity import record_activity
+from tiebas.models import Tieba, TiebaMember
+from common.fieldsets import SparseFieldsetSerializerMixin
+from common.images import schedule_derivatives, rendition_url
+
+
+def sized_image_url(request, obj, default_size='medium'):
+    """根据请求中的 image_size 参数返回对应尺寸的图片地址"""
+    size = default_size
+    if request is not None:
+        size = request.query_params.get('image_size', default_size)
+    url = rendition_url(obj.image, obj.renditions, size)
+    if url and request is not None:
+        return request.build_absolute_uri(url)
+    return url
 
 
 class UserSimpleSerializer(serializers.ModelSerializer):
@@ -23,12 +40,18 @@ class TiebaSimpleSerializer(serializers.ModelSerializer):
 class PostImageSerializer(serializers.ModelSerializer):
     """帖子图片序列化器"""
     
+    url = serializers.SerializerMethodField()
+    
     class Meta:
         model = PostImage
-        fields = ['id', 'image', 'description', 'sort_order']
+        fields = ['id', 'image', 'url', 'width', 'height', 'renditions', 'description', 'sort_order']
+    
+    def get_url(self, obj):
+        """按 image_size 参数（thumbnail/medium/original，默认 medium）选择图片地址"""
+        return sized_image_url(self.context.get('request'), obj)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """帖子序列化器"""
     
     author_info = UserSimpleSerializer(source='author', read_only=True)
@@ -40,16 +63,22 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'content', 'author', 'author_info', 
+            'id', 'title', 'summary', 'content', 'author', 'author_info', 
             'tieba', 'tieba_info', 'view_count', 'reply_count', 
             'like_count', 'collect_count', 'status', 'is_top', 
             'is_essence', 'created_at', 'updated_at', 'last_reply_at',
             'images', 'is_liked', 'is_collected'
         ]
-        read_only_fields = ['author', 'view_count', 'reply_count', 'like_count', 'collect_count']
+        read_only_fields = ['author', 'summary', 'view_count', 'reply_count', 'like_count', 'collect_count']
+        # 列表接口默认不返回正文，需要时 ?expand=content
+        list_expandable_fields = ['content']
     
     def get_is_liked(self, obj):
         """检查当前用户是否点赞了该帖子"""
+        # 视图已批量加载整页状态时直接读取
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return PostLike.objects.filter(user=request.user, post=obj).exists()
@@ -57,6 +86,9 @@ class PostSerializer(serializers.ModelSerializer):
     
     def get_is_collected(self, obj):
         """检查当前用户是否收藏了该帖子"""
+        collected_post_ids = self.context.get('collected_post_ids')
+        if collected_post_ids is not None:
+            return obj.pk in collected_post_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return PostCollect.objects.filter(user=request.user, post=obj).exists()
@@ -83,30 +115,39 @@ class PostCreateSerializer(serializers.ModelSerializer):
         tieba = attrs.get('tieba')
         
         if request and request.user.is_authenticated:
-            from tiebas.models import TiebaMember
             if not TiebaMember.objects.filter(user=request.user, tieba=tieba, status=1).exists():
                 raise serializers.ValidationError("您不是该贴吧成员，无法发帖")
         
         return attrs
     
     def create(self, validated_data):
-        """创建帖子"""
-        images = validated_data.pop('images', [])
-        post = Post.objects.create(**validated_data)
+        """创建帖子
         
-        # 创建帖子图片
-        for i, image in enumerate(images):
-            PostImage.objects.create(
-                post=post,
-                image=image,
-                sort_order=i
+        帖子、图片和各项计数在同一个事务中写入，计数都用 F() 只更新计数列。
+        """
+        images = validated_data.pop('images', [])
+        with transaction.atomic(savepoint=False):
+            post = Post.objects.create(**validated_data)
+            
+            # 创建帖子图片，衍生图在事务提交后由后台生成
+            image_ids = []
+            for i, image in enumerate(images):
+                post_image = PostImage.objects.create(
+                    post=post,
+                    image=image,
+                    sort_order=i
+                )
+                image_ids.append(post_image.pk)
+            schedule_derivatives('posts.PostImage', image_ids)
+            
+            # 更新贴吧帖子统计，今日发帖数记入当天的活跃统计
+            Tieba.objects.filter(pk=post.tieba_id).update(post_count=F('post_count') + 1)
+            # 用户发帖数和在该贴吧的发帖数（成员排行榜按它排序）
+            User.objects.filter(pk=post.author_id).update(post_count=F('post_count') + 1)
+            TiebaMember.objects.filter(user_id=post.author_id, tieba_id=post.tieba_id).update(
+                post_count=F('post_count') + 1, last_active_at=timezone.now()
             )
-        
-        # 更新贴吧帖子统计
-        tieba = post.tieba
-        tieba.post_count += 1
-        tieba.today_post_count += 1
-        tieba.save()
+            record_activity(post.tieba_id, user_id=post.author_id, posts=1)
         
         return post
 
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import list_cache
+from .models import Post
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_list(sender, instance, **kwargs):
+    """发帖、删帖、置顶/加精等修改后使所在贴吧的帖子列表缓存失效
+
+    提交后再失效：事务提交前重建的列表看不到本次修改，不能缓存到新版本下。
+    """
+    tieba_id = instance.tieba_id
+    transaction.on_commit(lambda: list_cache.bump_version(tieba_id))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """帖子创建/修改后同步全文索引"""
+    # 只更新了计数等字段时无需重建索引
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    get_search_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_index(sender, instance, **kwargs):
+    """帖子删除后移除全文索引"""
+    get_search_backend().remove_post(instance.pk)
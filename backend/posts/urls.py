@@ -6,6 +6,7 @@ router = DefaultRouter()
 router.register(r'posts', views.PostViewSet)
 router.register(r'likes', views.PostLikeViewSet)
 router.register(r'collects', views.PostCollectViewSet)
+router.register(r'interactions', views.InteractionStateViewSet, basename='interaction')
 
 urlpatterns = [
     path('', include(router.urls)),
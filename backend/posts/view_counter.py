@@ -0,0 +1,261 @@
+"""
+帖子浏览数写缓冲
+
+详情页每次访问只在内存（或共享缓存）中累加浏览数，
+按时间间隔或累计阈值把聚合后的增量批量写回 Post.view_count。
+累计达到阈值时由请求线程写回；没有访问时由后台线程按间隔写回，
+写回失败的增量放回缓冲，下次再写。
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class LocalViewCountStore:
+    """进程内计数存储"""
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def incr(self, post_id, delta=1):
+        with self._lock:
+            self._counts[post_id] += delta
+            return self._counts[post_id]
+
+    def get(self, post_id):
+        with self._lock:
+            return self._counts.get(post_id, 0)
+
+    def drain(self):
+        """取出并清空全部待写入的增量"""
+        with self._lock:
+            counts = dict(self._counts)
+            self._counts.clear()
+        return counts
+
+
+class CacheViewCountStore:
+    """基于 Django 缓存的计数存储（多进程共享，如 Redis）
+
+    待写回的帖子ID也放在共享缓存中：帖子的增量从 0 变为正数时领取一个递增编号，
+    把帖子ID写入该编号的槽位；drain() 按编号读取上次读到之后的槽位，
+    任何进程（包括 flush_view_counts 命令）都能取出全部进程的增量。
+    """
+
+    key_prefix = 'post_views:'
+    # 同一时刻只允许一个进程读取槽位，锁在进程异常退出后自动过期（秒）
+    drain_lock_timeout = 60
+    # 编号已领取但槽位一直没有写入（写入的进程中途退出）时，连续读取几次后跳过
+    max_slot_misses = 3
+
+    def __init__(self, alias='default', timeout=None):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self._seq_key = f'{self.key_prefix}dirty_seq'
+        self._drained_key = f'{self.key_prefix}dirty_drained'
+        self._miss_key = f'{self.key_prefix}dirty_miss'
+        self._lock_key = f'{self.key_prefix}drain_lock'
+
+    def _key(self, post_id):
+        return f'{self.key_prefix}{post_id}'
+
+    def _slot_key(self, seq):
+        return f'{self.key_prefix}dirty:{seq}'
+
+    def _mark_dirty(self, post_id):
+        self.cache.add(self._seq_key, 0, None)
+        seq = self.cache.incr(self._seq_key)
+        self.cache.set(self._slot_key(seq), post_id, None)
+
+    def incr(self, post_id, delta=1):
+        key = self._key(post_id)
+        # add 保证键存在，incr 在 Redis 等后端上是原子操作
+        self.cache.add(key, 0, self.timeout)
+        value = self.cache.incr(key, delta)
+        # 增量从 0 变为正数的那一次负责登记，之后的访问不再写槽位
+        if value == delta:
+            self._mark_dirty(post_id)
+        return value
+
+    def get(self, post_id):
+        return self.cache.get(self._key(post_id)) or 0
+
+    def _read_slots(self):
+        """返回 (读到的帖子ID, 已读到的编号, 读过的槽位键)，遇到尚未写入的槽位时停在它之前"""
+        start = self.cache.get(self._drained_key, 0)
+        end = self.cache.get(self._seq_key, 0)
+        keys = {seq: self._slot_key(seq) for seq in range(start + 1, end + 1)}
+        slots = self.cache.get_many(list(keys.values()))
+        post_ids = set()
+        read_keys = []
+        for seq, key in keys.items():
+            if key not in slots:
+                seen_seq, misses = self.cache.get(self._miss_key, (None, 0))
+                misses = misses + 1 if seen_seq == seq else 1
+                if misses < self.max_slot_misses:
+                    self.cache.set(self._miss_key, (seq, misses), None)
+                    return post_ids, seq - 1, read_keys
+                continue
+            post_ids.add(slots[key])
+            read_keys.append(key)
+        return post_ids, end, read_keys
+
+    def drain(self):
+        if not self.cache.add(self._lock_key, 1, self.drain_lock_timeout):
+            # 其他进程正在读取，本次跳过
+            return {}
+        try:
+            post_ids, drained, read_keys = self._read_slots()
+            counts = {}
+            for post_id in post_ids:
+                key = self._key(post_id)
+                value = self.cache.get(key) or 0
+                if not value:
+                    continue
+                # 只扣减读到的值，期间其他进程的增量保留到下一次刷新；
+                # 这部分增量登记时计数不是从 0 开始，需要重新登记
+                if self.cache.decr(key, value) > 0:
+                    self._mark_dirty(post_id)
+                counts[post_id] = value
+            self.cache.set(self._drained_key, drained, None)
+            self.cache.delete_many(read_keys)
+            return counts
+        finally:
+            self.cache.delete(self._lock_key)
+
+
+class ViewCountBuffer:
+    """浏览数写缓冲"""
+
+    def __init__(self, store, flush_interval=10, flush_threshold=100):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def incr(self, post_id, delta=1):
+        """记录一次浏览，返回该帖子尚未写回数据库的增量"""
+        self._start_timer()
+        pending = self.store.incr(post_id, delta)
+        with self._pending_lock:
+            self._pending += delta
+        if self._should_flush():
+            # 本次刷新写回的部分在调用方读到的行里还没有体现，需要一并返回
+            try:
+                flushed = self._flush()
+            except Exception:
+                # 增量已放回缓冲，不影响本次访问
+                logger.exception('浏览数写回失败，增量保留到下一次写回')
+                return self.store.get(post_id)
+            pending = flushed.get(post_id, 0) + self.store.get(post_id)
+        return pending
+
+    def get_pending(self, post_id):
+        """获取该帖子尚未写回数据库的增量"""
+        return self.store.get(post_id)
+
+    def _start_timer(self):
+        """首次记录浏览时启动后台线程，按间隔写回"""
+        if self._timer is not None:
+            return
+        with self._pending_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(target=self._run_timer, name='view-count-flush', daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                continue
+            try:
+                self._flush()
+            except Exception:
+                logger.exception('浏览数写回失败，增量保留到下一次写回')
+            finally:
+                connection.close()
+
+    def _should_flush(self):
+        if self._pending >= self.flush_threshold:
+            return True
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        """把聚合后的增量批量写回数据库，返回更新的帖子数"""
+        return len(self._flush())
+
+    def _flush(self):
+        from .models import Post
+
+        # 已有线程在刷新时直接返回，不阻塞请求
+        if not self._flush_lock.acquire(blocking=False):
+            return {}
+        try:
+            counts = self.store.drain()
+            with self._pending_lock:
+                self._pending = 0
+            self._last_flush = time.monotonic()
+
+            # 相同增量的帖子合并为一条 UPDATE，且只写 view_count 列
+            by_delta = defaultdict(list)
+            for post_id, delta in counts.items():
+                if delta:
+                    by_delta[delta].append(post_id)
+            try:
+                # 全部 UPDATE 在一个事务中，失败时整体回滚，增量原样放回缓冲
+                with transaction.atomic():
+                    for delta, post_ids in by_delta.items():
+                        Post.objects.filter(pk__in=post_ids).update(
+                            view_count=F('view_count') + delta
+                        )
+            except Exception:
+                for post_id, delta in counts.items():
+                    if delta:
+                        self.store.incr(post_id, delta)
+                with self._pending_lock:
+                    self._pending += sum(counts.values())
+                raise
+            return counts
+        finally:
+            self._flush_lock.release()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_count_buffer():
+    """获取按 settings.VIEW_COUNT_BUFFER 配置的全局浏览数缓冲"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                options = getattr(settings, 'VIEW_COUNT_BUFFER', {})
+                if options.get('BACKEND', 'local') == 'cache':
+                    store = CacheViewCountStore(options.get('CACHE_ALIAS', 'default'))
+                else:
+                    store = LocalViewCountStore()
+                _buffer = ViewCountBuffer(
+                    store,
+                    flush_interval=options.get('FLUSH_INTERVAL', 10),
+                    flush_threshold=options.get('FLUSH_THRESHOLD', 100),
+                )
+                # 进程退出前写回剩余增量
+                atexit.register(_buffer.flush)
+    return _buffer
@@ -1,30 +1,76 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Q
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from common.conditional import ConditionalGetMixin
+from common.counters import toggle_relation
+from common.fieldsets import SparseFieldsetViewMixin
 from .models import Post, PostImage, PostLike, PostCollect
 from .serializers import (
     PostSerializer, PostCreateSerializer, 
     PostLikeSerializer, PostCollectSerializer
 )
+from .export import iter_gzip, iter_ndjson, iter_thread_records
+from .interactions import get_post_interaction_state
+from . import list_cache
+from .pagination import PostCursorPagination
+from .search import SearchResults, get_search_backend
+from .view_counter import get_view_count_buffer
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """帖子视图集"""
     
     queryset = Post.objects.filter(status=1)  # 只显示正常状态的帖子
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # 浏览数不参与 ETag，否则每次访问都会使客户端缓存失效；
+    # 作者、贴吧的更新时间使嵌套的 author_info / tieba_info 变化时 ETag 随之变化
+    etag_fields = (
+        'updated_at', 'last_reply_at', 'reply_count', 'like_count',
+        'collect_count', 'is_top', 'is_essence', 'author__updated_at', 'tieba__updated_at'
+    )
+    last_modified_fields = ('updated_at', 'last_reply_at', 'author__updated_at', 'tieba__updated_at')
+    sparse_select_related = {'author_info': 'author', 'tieba_info': 'tieba'}
+    sparse_prefetch_related = {'images': 'images'}
+    sparse_deferred = {'content': 'content'}
     
     def get_serializer_class(self):
         if self.action == 'create':
             return PostCreateSerializer
         return PostSerializer
     
+    @property
+    def paginator(self):
+        """带 cursor 参数或 pagination=cursor 时使用键集分页，否则保持页码分页（管理界面使用）"""
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            # 全文检索结果按相关度排序，只支持页码分页
+            if self.action == 'list' and not params.get('search') and (
+                params.get('pagination') == 'cursor' or 'cursor' in params
+            ):
+                self._paginator = PostCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
+    def get_serializer(self, *args, **kwargs):
+        """序列化帖子时批量加载当前用户的点赞/收藏状态"""
+        serializer_class = self.get_serializer_class()
+        kwargs.setdefault('context', self.get_serializer_context())
+        selection = self.get_sparse_fields()
+        wants_state = selection is None or {'is_liked', 'is_collected'} & selection
+        if args and serializer_class is PostSerializer and wants_state:
+            posts = args[0] if kwargs.get('many') else [args[0]]
+            kwargs['context'].update(
+                get_post_interaction_state(self.request.user, [post.pk for post in posts])
+            )
+        return serializer_class(*args, **kwargs)
+    
     def get_queryset(self):
         """过滤查询集"""
-        queryset = super().get_queryset()
+        queryset = self.apply_sparse_fieldset(super().get_queryset())
         
         # 按贴吧过滤
         tieba_id = self.request.query_params.get('tieba_id')
@@ -41,14 +87,42 @@ class PostViewSet(viewsets.ModelViewSet):
         if status:
             queryset = queryset.filter(status=status)
         
-        # 搜索
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | Q(content__icontains=search)
-            )
+        return queryset.order_by('-is_top', '-created_at', '-id')
+    
+    def list(self, request, *args, **kwargs):
+        """帖子列表，带 search 参数时走全文检索"""
+        search = request.query_params.get('search')
+        if not search:
+            return self._cached_list(request, *args, **kwargs)
         
-        return queryset.order_by('-is_top', '-created_at')
+        filters = {}
+        for key in ('tieba_id', 'author_id'):
+            if request.query_params.get(key):
+                filters[key] = request.query_params[key]
+        results = SearchResults(
+            get_search_backend(), search, self.get_queryset(), filters
+        )
+        page = self.paginate_queryset(results)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(results[:], many=True)
+        return Response(serializer.data)
+    
+    def _cached_list(self, request, *args, **kwargs):
+        """贴吧帖子列表走版本化响应缓存"""
+        key = list_cache.cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        
+        data = list_cache.get_cached(key, request.user, self.get_sparse_fields())
+        if data is not None:
+            return Response(data)
+        
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            list_cache.set_cached(key, response.data)
+        return response
     
     def perform_create(self, serializer):
         """创建帖子时设置作者"""
@@ -56,93 +130,62 @@ class PostViewSet(viewsets.ModelViewSet):
     
     def retrieve(self, request, *args, **kwargs):
         """获取帖子详情时增加浏览数"""
+        validators = self.get_validators()
+        not_modified = self.get_not_modified_response(request, validators)
+        if not_modified is not None:
+            # 304 也计一次浏览，只写缓冲不查整行
+            get_view_count_buffer().incr(int(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+            return not_modified
+        
         instance = self.get_object()
-        instance.view_count += 1
-        instance.save()
+        # 浏览数先记入写缓冲，返回值包含尚未写回的增量
+        instance.view_count += get_view_count_buffer().incr(instance.pk)
         serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        return self.set_validator_headers(Response(serializer.data), validators)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
-        """点赞帖子"""
+        """点赞帖子（重复点赞不报错）"""
         post = self.get_object()
-        
-        # 检查是否已经点赞
-        if PostLike.objects.filter(user=request.user, post=post).exists():
-            return Response(
-                {'error': '您已经点赞过该帖子'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # 创建点赞记录
-        PostLike.objects.create(user=request.user, post=post)
-        
-        # 更新帖子点赞数
-        post.like_count += 1
-        post.save()
-        
-        return Response({'message': '点赞成功', 'like_count': post.like_count})
+        changed, like_count = toggle_relation(
+            PostLike, {'user': request.user, 'post': post},
+            Post, post.pk, 'like_count', active=True
+        )
+        message = '点赞成功' if changed else '您已经点赞过该帖子'
+        return Response({'message': message, 'like_count': like_count, 'is_liked': True})
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def unlike(self, request, pk=None):
-        """取消点赞"""
+        """取消点赞（未点赞时不报错）"""
         post = self.get_object()
-        
-        try:
-            like = PostLike.objects.get(user=request.user, post=post)
-            like.delete()
-            
-            # 更新帖子点赞数
-            post.like_count -= 1
-            post.save()
-            
-            return Response({'message': '取消点赞成功', 'like_count': post.like_count})
-        except PostLike.DoesNotExist:
-            return Response(
-                {'error': '您还没有点赞过该帖子'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        changed, like_count = toggle_relation(
+            PostLike, {'user': request.user, 'post': post},
+            Post, post.pk, 'like_count', active=False
+        )
+        message = '取消点赞成功' if changed else '您还没有点赞过该帖子'
+        return Response({'message': message, 'like_count': like_count, 'is_liked': False})
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def collect(self, request, pk=None):
-        """收藏帖子"""
+        """收藏帖子（重复收藏不报错）"""
         post = self.get_object()
-        
-        # 检查是否已经收藏
-        if PostCollect.objects.filter(user=request.user, post=post).exists():
-            return Response(
-                {'error': '您已经收藏过该帖子'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # 创建收藏记录
-        PostCollect.objects.create(user=request.user, post=post)
-        
-        # 更新帖子收藏数
-        post.collect_count += 1
-        post.save()
-        
-        return Response({'message': '收藏成功', 'collect_count': post.collect_count})
+        changed, collect_count = toggle_relation(
+            PostCollect, {'user': request.user, 'post': post},
+            Post, post.pk, 'collect_count', active=True
+        )
+        message = '收藏成功' if changed else '您已经收藏过该帖子'
+        return Response({'message': message, 'collect_count': collect_count, 'is_collected': True})
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def uncollect(self, request, pk=None):
-        """取消收藏"""
+        """取消收藏（未收藏时不报错）"""
         post = self.get_object()
-        
-        try:
-            collect = PostCollect.objects.get(user=request.user, post=post)
-            collect.delete()
-            
-            # 更新帖子收藏数
-            post.collect_count -= 1
-            post.save()
-            
-            return Response({'message': '取消收藏成功', 'collect_count': post.collect_count})
-        except PostCollect.DoesNotExist:
-            return Response(
-                {'error': '您还没有收藏过该帖子'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        changed, collect_count = toggle_relation(
+            PostCollect, {'user': request.user, 'post': post},
+            Post, post.pk, 'collect_count', active=False
+        )
+        message = '取消收藏成功' if changed else '您还没有收藏过该帖子'
+        return Response({'message': message, 'collect_count': collect_count, 'is_collected': False})
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def set_top(self, request, pk=None):
@@ -165,7 +208,7 @@ class PostViewSet(viewsets.ModelViewSet):
             )
         
         post.is_top = not post.is_top
-        post.save()
+        post.save(update_fields=['is_top', 'updated_at'])
         
         return Response({'is_top': post.is_top})
     
@@ -190,9 +233,96 @@ class PostViewSet(viewsets.ModelViewSet):
             )
         
         post.is_essence = not post.is_essence
-        post.save()
+        post.save(update_fields=['is_essence', 'updated_at'])
         
         return Response({'is_essence': post.is_essence})
+    
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """以 NDJSON 流式导出整楼（帖子 + 全部评论和回复）
+        
+        gzip=true 时边生成边压缩；include_hidden=true 时包含待审核和已删除的评论，仅限管理员和吧主。
+        """
+        post = self.get_object()
+        params = request.query_params
+        include_hidden = params.get('include_hidden') == 'true'
+        if include_hidden and not request.user.is_staff:
+            from tiebas.models import TiebaMember
+            is_moderator = request.user.is_authenticated and TiebaMember.objects.filter(
+                user=request.user, tieba_id=post.tieba_id, role__gte=1
+            ).exists()
+            if not is_moderator:
+                return Response({'error': '权限不足'}, status=status.HTTP_403_FORBIDDEN)
+        
+        chunks = iter_ndjson(iter_thread_records(post.pk, include_hidden=include_hidden))
+        filename = f'post-{post.pk}.ndjson'
+        if params.get('gzip') == 'true':
+            response = StreamingHttpResponse(iter_gzip(chunks), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(chunks, content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class InteractionStateViewSet(viewsets.ViewSet):
+    """批量查询当前用户的互动状态
+    
+    GET  ?post_ids=1,2,3&comment_ids=4,5
+    POST {"post_ids": [1, 2, 3], "comment_ids": [4, 5]}
+    每种关系最多一次查询，未登录用户直接返回全部为 false。
+    """
+    
+    permission_classes = [AllowAny]
+    max_batch_size = 200
+    
+    def list(self, request):
+        return self._state_response(request.query_params, request)
+    
+    def create(self, request):
+        return self._state_response(request.data, request)
+    
+    def _parse_ids(self, data, key):
+        value = data.get(key) or []
+        if isinstance(value, str):
+            value = value.split(',')
+        ids = []
+        for item in value:
+            if str(item).strip():
+                ids.append(int(item))
+        return list(dict.fromkeys(ids))
+    
+    def _state_response(self, data, request):
+        try:
+            post_ids = self._parse_ids(data, 'post_ids')
+            comment_ids = self._parse_ids(data, 'comment_ids')
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'post_ids 和 comment_ids 必须是整数ID列表'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(post_ids) > self.max_batch_size or len(comment_ids) > self.max_batch_size:
+            return Response(
+                {'error': f'每次最多查询 {self.max_batch_size} 个帖子和 {self.max_batch_size} 个评论'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from comments.interactions import get_comment_interaction_state
+        post_state = get_post_interaction_state(request.user, post_ids)
+        comment_state = get_comment_interaction_state(request.user, comment_ids)
+        return Response({
+            'posts': {
+                str(pk): {
+                    'liked': pk in post_state['liked_post_ids'],
+                    'collected': pk in post_state['collected_post_ids'],
+                }
+                for pk in post_ids
+            },
+            'comments': {
+                str(pk): {'liked': pk in comment_state['liked_comment_ids']}
+                for pk in comment_ids
+            },
+        })
 
 
 class PostLikeViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,79 @@
+"""
+贴吧每日活跃统计
+
+record_activity() 在发帖、评论、加入贴吧时累加当天（settings.TIME_ZONE）的统计行；
+今日数据和 7/30 天趋势都从 TiebaDailyActivity 按日期读取。
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from common.counters import upsert_increment
+
+from .models import TiebaActiveUser, TiebaDailyActivity
+
+COUNTER_FIELDS = ('post_count', 'comment_count', 'new_member_count', 'active_user_count')
+
+
+def today():
+    """按 settings.TIME_ZONE（Asia/Shanghai）划分的今天"""
+    return timezone.localdate(timezone=timezone.get_default_timezone())
+
+
+def _mark_active(tieba_id, user_id, day):
+    """登记当天活跃用户，当天第一次活跃时返回 True"""
+    # 进程内/共享缓存挡掉同一用户当天的重复写入，未命中时以数据库唯一约束为准
+    key = f'tieba_active:{day.isoformat()}:{tieba_id}:{user_id}'
+    if cache.get(key):
+        return False
+    # 标记在事务提交后才写入：外层的发帖、评论事务回滚时活跃记录也回滚，标记不能留下
+    transaction.on_commit(lambda: cache.set(key, 1, 2 * 24 * 3600))
+    try:
+        with transaction.atomic():
+            TiebaActiveUser.objects.create(tieba_id=tieba_id, user_id=user_id, date=day)
+    except IntegrityError:
+        return False
+    return True
+
+
+def record_activity(tieba_id, user_id=None, posts=0, comments=0, new_members=0):
+    """累加贴吧当天的活跃统计"""
+    day = today()
+    deltas = {'post_count': posts, 'comment_count': comments, 'new_member_count': new_members}
+    if user_id is not None and _mark_active(tieba_id, user_id, day):
+        deltas['active_user_count'] = 1
+    upsert_increment(
+        TiebaDailyActivity, {'tieba_id': tieba_id, 'date': day},
+        {name: value for name, value in deltas.items() if value}
+    )
+
+
+def get_today_post_counts(tieba_ids):
+    """一次查询返回 {贴吧ID: 今日发帖数}"""
+    return dict(
+        TiebaDailyActivity.objects.filter(tieba_id__in=list(tieba_ids), date=today())
+        .values_list('tieba_id', 'post_count')
+    )
+
+
+def get_activity_trend(tieba_id, days):
+    """最近 days 天（含今天）的逐日统计和合计，没有活动的日期补零"""
+    end = today()
+    start = end - timedelta(days=days - 1)
+    rows = {
+        row['date']: row for row in
+        TiebaDailyActivity.objects.filter(tieba_id=tieba_id, date__gte=start, date__lte=end)
+        .values('date', *COUNTER_FIELDS)
+    }
+    daily = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, {})
+        daily.append({'date': day, **{name: row.get(name, 0) for name in COUNTER_FIELDS}})
+    # 活跃用户按天去重，合计为各天之和（人次）
+    totals = {name: sum(item[name] for item in daily) for name in COUNTER_FIELDS}
+    return {'days': days, 'totals': totals, 'daily': daily}
+
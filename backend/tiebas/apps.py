@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class TiebasConfig(AppConfig):
+    name = 'tiebas'
+    verbose_name = '贴吧'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,181 @@
+"""
+贴吧名称自动补全
+
+进程内维护按规范化名称排序的数组，用 bisect 定位前缀区间，按成员数取前几个。
+命中贴吧很多的短前缀（如单字）把排好序的结果缓存起来，贴吧变化时只修正
+该贴吧名称的各级前缀。
+
+- 首次请求时从数据库加载全部正常贴吧，之后查询只读内存
+- 本进程内贴吧创建、改名、封禁、成员数变化通过信号增量更新
+- 其他进程的改动靠定期重建同步：超过 TIEBA_AUTOCOMPLETE_REFRESH 秒后，
+  下一次查询在后台线程重建，重建完成前继续使用旧数据
+- 读写都持有同一把锁，多个工作线程共享一份数据
+"""
+
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Tieba
+
+# 单次最多返回的建议数
+MAX_SUGGESTIONS = 10
+# 前缀区间超过该长度时缓存排序结果
+CACHE_THRESHOLD = 256
+# 前缀结果缓存的最大条数，写满后整体清空
+MAX_CACHED_PREFIXES = 10000
+
+
+def normalize(name):
+    """全角转半角、大小写折叠并去掉空白"""
+    return ''.join(unicodedata.normalize('NFKC', name or '').casefold().split())
+
+
+class TiebaAutocomplete:
+    """贴吧名称前缀索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []      # [(规范化名称, 贴吧ID)]，有序
+        self._entries = {}   # 贴吧ID -> (规范化名称, 名称, 成员数)
+        self._top = {}       # 前缀 -> 按成员数排好的贴吧ID
+        self._built_at = None
+        self._refreshing = False
+        self._pending = []   # 后台重建期间收到的更新，重建完成后重放
+
+    def _load(self):
+        rows = Tieba.objects.filter(status=1).values_list('id', 'name', 'member_count').iterator(chunk_size=5000)
+        entries = {pk: (normalize(name), name, member_count) for pk, name, member_count in rows}
+        keys = sorted((key, pk) for pk, (key, _, _) in entries.items())
+        return keys, entries
+
+    def build(self):
+        """从数据库重建"""
+        keys, entries = self._load()
+        with self._lock:
+            self._keys, self._entries, self._top = keys, entries, {}
+            self._built_at = time.monotonic()
+            pending, self._pending = self._pending, []
+            for tieba in pending:
+                self._apply(tieba)
+
+    def _refresh_in_background(self):
+        try:
+            self.build()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._pending = []
+            connection.close()
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            with self._lock:
+                if self._built_at is None:
+                    self.build()
+            return
+        age = time.monotonic() - self._built_at
+        if age > settings.TIEBA_AUTOCOMPLETE_REFRESH and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def _rerank_prefixes(self, key, pk, dropped=False):
+        """某个贴吧加入、移除或成员数变化后修正它各级前缀的缓存结果
+
+        只有这一个贴吧的排名变了：它变好或新加入时，新的前几名一定在
+        旧结果加上它之中，直接合并；它在旧结果中且变差或被移除时才丢弃缓存。
+        """
+        for end in range(1, len(key) + 1):
+            prefix = key[:end]
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if pk in top and dropped:
+                del self._top[prefix]
+            elif pk in self._entries:
+                self._top[prefix] = heapq.nsmallest(
+                    MAX_SUGGESTIONS, set(top) | {pk}, key=lambda i: self._rank(i, prefix)
+                )
+
+    def _discard(self, pk):
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        index = bisect_left(self._keys, (entry[0], pk))
+        if index < len(self._keys) and self._keys[index] == (entry[0], pk):
+            del self._keys[index]
+        self._rerank_prefixes(entry[0], pk, dropped=True)
+
+    def update(self, tieba):
+        """贴吧保存后同步（未加载时忽略，加载时会读到最新数据）"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if self._refreshing:
+                self._pending.append(tieba)
+            self._apply(tieba)
+
+    def _apply(self, tieba):
+        if tieba.status != 1:
+            self._discard(tieba.pk)
+            return
+        key = normalize(tieba.name)
+        entry = self._entries.get(tieba.pk)
+        if entry is not None and entry[0] == key:
+            # 只有成员数变化：不动有序数组
+            if entry[2] != tieba.member_count:
+                self._entries[tieba.pk] = (key, tieba.name, tieba.member_count)
+                self._rerank_prefixes(key, tieba.pk, dropped=tieba.member_count < entry[2])
+            return
+        self._discard(tieba.pk)
+        self._entries[tieba.pk] = (key, tieba.name, tieba.member_count)
+        insort(self._keys, (key, tieba.pk))
+        self._rerank_prefixes(key, tieba.pk)
+
+    def remove(self, pk):
+        with self._lock:
+            self._discard(pk)
+
+    def _ranked(self, prefix, limit):
+        start = bisect_left(self._keys, (prefix,))
+        # 前缀区间的上界：所有以 prefix 开头的键都小于 prefix + U+10FFFF
+        stop = bisect_left(self._keys, (prefix + '\U0010ffff',), start)
+        candidates = (pk for _, pk in self._keys[start:stop])
+        if stop - start <= CACHE_THRESHOLD:
+            return heapq.nsmallest(limit, candidates, key=lambda pk: self._rank(pk, prefix))
+        top = self._top.get(prefix)
+        if top is None:
+            top = heapq.nsmallest(MAX_SUGGESTIONS, candidates, key=lambda pk: self._rank(pk, prefix))
+            if len(self._top) >= MAX_CACHED_PREFIXES:
+                self._top.clear()
+            self._top[prefix] = top
+        return top[:limit]
+
+    def _rank(self, pk, prefix):
+        key, _, member_count = self._entries[pk]
+        # 名称完全匹配的排最前，其余成员数多的在前，同成员数时名称短的在前
+        return (key != prefix, -member_count, len(key), pk)
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        """返回 [{'id', 'name', 'member_count'}]"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        self._ensure_fresh()
+        with self._lock:
+            return [
+                {'id': pk, 'name': self._entries[pk][1], 'member_count': self._entries[pk][2]}
+                for pk in self._ranked(prefix, limit)
+            ]
+
+
+autocomplete = TiebaAutocomplete()
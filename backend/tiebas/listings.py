@@ -0,0 +1,180 @@
+"""
+首页贴吧列表的共享快照
+
+推荐贴吧和贴吧分类对所有访客相同，序列化结果作为快照放在缓存中：
+- 快照带软过期时间，过期后只有抢到锁的一个请求重建，其余请求继续返回旧快照，
+  冷启动时其余请求短暂等待重建结果，不会同时压到数据库上
+- 分类增删改、推荐贴吧的内容变化时把版本号加一，旧快照立即失效；
+  成员数等计数的变化只在快照过期后体现
+- 分类的贴吧数、成员总数在贴吧创建、删除、审核状态或分类变化以及加入、退出贴吧时
+  用 F() 增减（adjust_category_counts），recount / reconcile_counters 负责纠正偏差
+- 推荐贴吧中与当前用户相关的 is_member/member_role 命中后再按用户补上，
+  匿名用户不查询数据库
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Value
+
+from .activity import get_today_post_counts, today
+from .models import Tieba, TiebaCategory
+from .serializers import TiebaCategorySerializer, TiebaSerializer
+
+# 推荐贴吧数量
+RECOMMENDED_SIZE = 10
+# 与当前用户相关、不能进入共享快照的字段
+PER_USER_FIELDS = ('is_member', 'member_role')
+# 快照中按相对路径保存、返回时补全为绝对地址的图片字段（嵌套字段写成路径）
+IMAGE_FIELDS = (('avatar',), ('banner',), ('owner_info', 'avatar'))
+# 重建锁的过期时间（秒），重建进程异常退出时锁自动释放
+LOCK_TIMEOUT = 30
+# 冷启动时等待其他请求重建的轮询间隔和次数
+WAIT_INTERVAL = 0.05
+WAIT_STEPS = 40
+
+VERSION_KEY = 'tieba_listing_version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """使全部首页列表快照失效"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _snapshot_key(name):
+    return f'tieba_listing:{name}:v{get_version()}'
+
+
+def get_snapshot(name, build):
+    """读取快照，过期或不存在时由一个请求重建"""
+    timeout = settings.TIEBA_LISTING_CACHE_TIMEOUT
+    key = _snapshot_key(name)
+    entry = cache.get(key)
+    if entry is not None and entry['expires'] > time.time():
+        return entry['data']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            data = build()
+            # 缓存保留两倍时间，软过期后重建期间仍有旧快照可用
+            cache.set(key, {'data': data, 'expires': time.time() + timeout}, timeout * 2)
+        finally:
+            cache.delete(lock_key)
+        return data
+    if entry is not None:
+        return entry['data']
+
+    for _ in range(WAIT_STEPS):
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['data']
+    return build()
+
+
+def adjust_category_counts(category_id, tiebas=0, members=0):
+    """增减分类的贴吧数、成员总数（只统计正常状态的贴吧，调用方负责判断）"""
+    if category_id is None or not (tiebas or members):
+        return
+    TiebaCategory.objects.filter(pk=category_id).update(
+        tieba_count=F('tieba_count') + tiebas, member_count=F('member_count') + members
+    )
+
+
+def _fingerprint(tieba):
+    """推荐列表中除计数以外的内容，变化时快照需要失效"""
+    return [
+        tieba.name, tieba.description, tieba.avatar.name or None, tieba.banner.name or None,
+        tieba.owner_id, tieba.category_id, tieba.status, tieba.is_recommended,
+    ]
+
+
+def _build_recommended():
+    tiebas = list(
+        # Value(True) 生成 is_recommended = true，布尔列单独作条件时用不上 tieba_recommended_idx
+        Tieba.objects.filter(status=1, is_recommended=Value(True))
+        .select_related('owner', 'category').order_by('-member_count')[:RECOMMENDED_SIZE]
+    )
+    context = {
+        'today_post_counts': get_today_post_counts([tieba.pk for tieba in tiebas]),
+        'tieba_memberships': {},
+    }
+    results = [
+        {key: value for key, value in item.items() if key not in PER_USER_FIELDS}
+        for item in TiebaSerializer(tiebas, many=True, context=context).data
+    ]
+    return {
+        'results': results,
+        'fingerprints': {tieba.pk: _fingerprint(tieba) for tieba in tiebas},
+    }
+
+
+def _recommended_name():
+    # 今日发帖数在零点归零，按日期区分快照
+    return f'recommended:{today().isoformat()}'
+
+
+def get_recommended(request):
+    """推荐贴吧（不含 is_member/member_role），返回副本，调用方可以直接修改"""
+    results = []
+    for item in get_snapshot(_recommended_name(), _build_recommended)['results']:
+        item = dict(item)
+        # 快照与访问的域名无关，图片地址按本次请求补全（与 DRF ImageField 一致）
+        for *parents, name in IMAGE_FIELDS:
+            target = item
+            for parent in parents:
+                if not target.get(parent):
+                    break
+                target[parent] = target = dict(target[parent])
+            else:
+                if target.get(name):
+                    target[name] = request.build_absolute_uri(target[name])
+        results.append(item)
+    return results
+
+
+def _build_categories():
+    categories = TiebaCategory.objects.filter(status=True).order_by('sort_order', 'id')
+    return list(TiebaCategorySerializer(categories, many=True).data)
+
+
+def get_categories():
+    return get_snapshot('categories', _build_categories)
+
+
+def tieba_changed(tieba):
+    """贴吧保存后判断推荐快照是否需要失效（只比较内容，成员数变化不失效）"""
+    entry = cache.get(_snapshot_key(_recommended_name()))
+    if entry is None:
+        return
+    snapshot = entry['data']
+    listed = snapshot['fingerprints'].get(tieba.pk)
+    if listed is not None:
+        if listed != _fingerprint(tieba):
+            bump_version()
+        return
+    # 新推荐的贴吧，或成员数超过了列表中的最后一名
+    results = snapshot['results']
+    if tieba.status == 1 and tieba.is_recommended and (
+        len(results) < RECOMMENDED_SIZE or tieba.member_count > results[-1]['member_count']
+    ):
+        bump_version()
+
+
+def warm():
+    """预热全部快照，首个访客不用等待重建"""
+    get_categories()
+    get_snapshot(_recommended_name(), _build_recommended)
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from tiebas.activity import today
+from tiebas.models import TiebaActiveUser
+
+
+class Command(BaseCommand):
+    """清理过期的贴吧活跃用户去重记录"""
+
+    help = '删除早于 --keep-days 天的贴吧活跃用户去重记录（每日统计不受影响）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=2, help='保留最近几天的记录')
+        parser.add_argument('--batch-size', type=int, default=10000, help='每次删除的行数')
+
+    def handle(self, *args, **options):
+        cutoff = today() - timedelta(days=options['keep_days'])
+        deleted = 0
+        while True:
+            pks = list(
+                TiebaActiveUser.objects.filter(date__lt=cutoff)
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not pks:
+                break
+            deleted += TiebaActiveUser.objects.filter(pk__in=pks).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 条记录'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tiebas.models import Tieba
+from tiebas.search import rebuild
+
+
+class Command(BaseCommand):
+    """重建贴吧检索词表"""
+
+    help = '重建贴吧检索词表，同时刷新词表中的成员数权重'
+
+    def handle(self, *args, **options):
+        tiebas = Tieba.objects.filter(status=1).only(
+            'id', 'name', 'description', 'status', 'member_count'
+        ).order_by('id').iterator(chunk_size=1000)
+        rebuild(tiebas)
+        self.stdout.write(self.style.SUCCESS('贴吧检索词表已重建'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from common.recount import get_counters, recount
+from tiebas import listings
+
+
+class Command(BaseCommand):
+    """重算贴吧分类统计并刷新首页列表快照"""
+
+    help = '重算贴吧分类的贴吧数和成员总数（平时随写入增减，这里纠正偏差），并使首页推荐贴吧、分类列表快照失效'
+
+    def handle(self, *args, **options):
+        recount(get_counters(['tiebas.TiebaCategory']), stdout=self.stdout)
+        listings.bump_version()
+        listings.warm()
+        self.stdout.write(self.style.SUCCESS('首页列表快照已刷新'))
@@ -0,0 +1,51 @@
+"""
+当前用户在贴吧中的成员身份批量加载
+
+用户的全部成员关系（贴吧ID -> 角色、状态）作为一个整体按用户缓存，
+贴吧列表整页共用，is_member / member_role 不再逐行查询；
+加入、退出、升降角色时由 signals 使缓存失效。
+缓存后端不跨进程共享时失效到不了其他进程，此时不缓存，只按当前页查询。
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.caches import is_shared_cache
+
+from .models import TiebaMember
+
+# 成员关系超过该数量的用户不整体缓存，只按当前页查询
+MAX_CACHED_MEMBERSHIPS = 5000
+
+
+def _cache_key(user_id):
+    return f'tieba_memberships:{user_id}'
+
+
+def _load(queryset):
+    return {tieba_id: (role, status) for tieba_id, role, status in
+            queryset.values_list('tieba_id', 'role', 'status')}
+
+
+def get_memberships(user, tieba_ids):
+    """返回 {贴吧ID: (角色, 状态)}，只包含用户加入过的贴吧；缓存未命中时一次查询"""
+    if not user or not user.is_authenticated:
+        return {}
+    if not is_shared_cache():
+        return _load(TiebaMember.objects.filter(user=user, tieba_id__in=list(tieba_ids)))
+    key = _cache_key(user.pk)
+    memberships = cache.get(key)
+    if memberships is None:
+        rows = list(
+            TiebaMember.objects.filter(user=user).order_by()
+            .values_list('tieba_id', 'role', 'status')[:MAX_CACHED_MEMBERSHIPS + 1]
+        )
+        if len(rows) > MAX_CACHED_MEMBERSHIPS:
+            return _load(TiebaMember.objects.filter(user=user, tieba_id__in=list(tieba_ids)))
+        memberships = {tieba_id: (role, status) for tieba_id, role, status in rows}
+        cache.set(key, memberships, settings.TIEBA_MEMBERSHIP_CACHE_TIMEOUT)
+    return memberships
+
+
+def invalidate_memberships(user_id):
+    cache.delete(_cache_key(user_id))
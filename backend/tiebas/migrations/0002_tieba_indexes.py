@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiebas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tieba',
+            index=models.Index(condition=models.Q(('is_recommended', True), ('status', 1)), fields=['-member_count'], name='tieba_recommended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['tieba', '-role', '-post_count'], name='tieba_member_list_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-18 16:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tiebas', '0002_tieba_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tieba',
+            name='today_post_count',
+        ),
+        migrations.CreateModel(
+            name='TiebaDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('post_count', models.IntegerField(default=0, verbose_name='发帖数')),
+                ('comment_count', models.IntegerField(default=0, verbose_name='评论数')),
+                ('new_member_count', models.IntegerField(default=0, verbose_name='新成员数')),
+                ('active_user_count', models.IntegerField(default=0, verbose_name='活跃用户数')),
+                ('tieba', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activities', to='tiebas.tieba', verbose_name='贴吧')),
+            ],
+            options={
+                'verbose_name': '贴吧每日活跃',
+                'verbose_name_plural': '贴吧每日活跃',
+                'db_table': 'tieba_daily_activity',
+                'unique_together': {('tieba', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TiebaActiveUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('tieba', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='active_users', to='tiebas.tieba', verbose_name='贴吧')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '贴吧活跃用户',
+                'verbose_name_plural': '贴吧活跃用户',
+                'db_table': 'tieba_active_user',
+                'unique_together': {('tieba', 'date', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2 on 2026-10-18 16:51
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 建表时的切词规则（tiebas.search.build_tokens 的快照），迁移不随后续修改而变化
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[^\W_]+')
+TOKEN_LENGTH = 32
+DESCRIPTION_INDEX_LENGTH = 200
+
+
+def tokenize(text):
+    tokens = []
+    text = (text or '').lower()
+    pos = 0
+    for match in CJK_RE.finditer(text):
+        tokens.extend(WORD_RE.findall(text[pos:match.start()]))
+        run = match.group()
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        pos = match.end()
+    tokens.extend(WORD_RE.findall(text[pos:]))
+    return tokens
+
+
+def build_tokens(tieba):
+    """返回 {词: 来源}，名称中的词优先记为名称来源"""
+    tokens = {}
+    for token in tokenize(tieba.description[:DESCRIPTION_INDEX_LENGTH]):
+        tokens[token[:TOKEN_LENGTH]] = 1
+    for token in tokenize(tieba.name):
+        tokens[token[:TOKEN_LENGTH]] = 0
+    return tokens
+
+
+def index_tiebas(apps, schema_editor):
+    """为已有的正常贴吧建立检索词表（之后批量导入的数据用 rebuild_tieba_search_index 命令补齐）"""
+    Tieba = apps.get_model('tiebas', 'Tieba')
+    TiebaSearchToken = apps.get_model('tiebas', 'TiebaSearchToken')
+    batch = []
+    for tieba in Tieba.objects.filter(status=1).only('id', 'name', 'description', 'member_count').iterator(chunk_size=1000):
+        batch.extend(
+            TiebaSearchToken(token=token, tieba_id=tieba.pk, source=source, member_count=tieba.member_count)
+            for token, source in build_tokens(tieba).items()
+        )
+        if len(batch) >= 1000:
+            TiebaSearchToken.objects.bulk_create(batch)
+            batch = []
+    TiebaSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiebas', '0003_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TiebaSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, verbose_name='词')),
+                ('source', models.SmallIntegerField(choices=[(0, '名称'), (1, '描述')], default=0, verbose_name='来源')),
+                ('member_count', models.IntegerField(default=0, verbose_name='成员数')),
+                ('tieba', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='tiebas.tieba', verbose_name='贴吧')),
+            ],
+            options={
+                'verbose_name': '贴吧检索词',
+                'verbose_name_plural': '贴吧检索词',
+                'db_table': 'tieba_search_token',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tiebasearchtoken',
+            index=models.Index(fields=['token', 'source', '-member_count', 'tieba'], name='tieba_search_rank_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tiebasearchtoken',
+            unique_together={('token', 'tieba')},
+        ),
+        migrations.RunPython(index_tiebas, migrations.RunPython.noop),
+    ]
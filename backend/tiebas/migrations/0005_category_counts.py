@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 17:22
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_counts(apps, schema_editor):
+    """按正常状态的贴吧计算已有分类的贴吧数和成员总数"""
+    Tieba = apps.get_model('tiebas', 'Tieba')
+    TiebaCategory = apps.get_model('tiebas', 'TiebaCategory')
+    rows = Tieba.objects.filter(status=1, category__isnull=False).order_by().values('category_id').annotate(
+        tiebas=Count('pk'), members=Sum('member_count')
+    )
+    for row in rows:
+        TiebaCategory.objects.filter(pk=row['category_id']).update(
+            tieba_count=row['tiebas'], member_count=row['members'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiebas', '0004_search_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tiebacategory',
+            name='member_count',
+            field=models.IntegerField(default=0, verbose_name='成员总数'),
+        ),
+        migrations.AddField(
+            model_name='tiebacategory',
+            name='tieba_count',
+            field=models.IntegerField(default=0, verbose_name='贴吧数'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
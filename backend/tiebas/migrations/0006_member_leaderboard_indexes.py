@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiebas', '0005_category_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tiebamember',
+            name='tieba_member_list_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['tieba', '-role', '-post_count', '-id'], name='tieba_member_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['tieba', '-post_count', '-id'], name='tieba_member_posts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['tieba', '-comment_count', '-id'], name='tieba_member_comments_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiebas', '0006_member_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tieba',
+            name='tieba_recommended_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tiebamember',
+            name='tieba_member_list_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tiebamember',
+            name='tieba_member_posts_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tiebamember',
+            name='tieba_member_comments_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tieba',
+            index=models.Index(fields=['status', 'is_recommended', '-member_count'], name='tieba_recommended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(fields=['status', 'tieba', '-role', '-post_count', '-id'], name='tieba_member_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(fields=['status', 'tieba', '-post_count', '-id'], name='tieba_member_posts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiebamember',
+            index=models.Index(fields=['status', 'tieba', '-comment_count', '-id'], name='tieba_member_comments_idx'),
+        ),
+    ]
@@ -11,6 +11,10 @@ class TiebaCategory(models.Model):
     status = models.BooleanField('状态', default=True)
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     
+    # 冗余统计（正常状态的贴吧），随贴吧和成员变化用 F() 增减，见 listings.adjust_category_counts
+    tieba_count = models.IntegerField('贴吧数', default=0)
+    member_count = models.IntegerField('成员总数', default=0)
+    
     class Meta:
         db_table = 'tieba_category'
         verbose_name = '贴吧分类'
@@ -53,7 +57,6 @@ class Tieba(models.Model):
     # 统计字段
     member_count = models.IntegerField('成员数', default=0)
     post_count = models.IntegerField('帖子数', default=0)
-    today_post_count = models.IntegerField('今日帖子数', default=0)
     
     # 管理字段
     status = models.SmallIntegerField('状态', choices=STATUS_CHOICES, default=0)
@@ -67,6 +70,13 @@ class Tieba(models.Model):
         db_table = 'tieba'
         verbose_name = '贴吧'
         verbose_name_plural = '贴吧'
+        indexes = [
+            # 推荐贴吧：status=1 AND is_recommended ORDER BY -member_count
+            models.Index(
+                fields=['status', 'is_recommended', '-member_count'],
+                name='tieba_recommended_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -116,6 +126,23 @@ class TiebaMember(models.Model):
         verbose_name = '贴吧成员'
         verbose_name_plural = '贴吧成员'
         unique_together = ('user', 'tieba')
+        indexes = [
+            # 成员列表：status=1 AND tieba_id=? ORDER BY -role, -post_count, -id（键集分页）
+            models.Index(
+                fields=['status', 'tieba', '-role', '-post_count', '-id'],
+                name='tieba_member_list_idx',
+            ),
+            # 发帖排行：status=1 AND tieba_id=? ORDER BY -post_count, -id
+            models.Index(
+                fields=['status', 'tieba', '-post_count', '-id'],
+                name='tieba_member_posts_idx',
+            ),
+            # 评论排行：status=1 AND tieba_id=? ORDER BY -comment_count, -id
+            models.Index(
+                fields=['status', 'tieba', '-comment_count', '-id'],
+                name='tieba_member_comments_idx',
+            ),
+        ]
     
     def __str__(self):
         return f'{self.user} - {self.tieba}'
@@ -150,4 +177,103 @@ class TiebaAnnouncement(models.Model):
         ordering = ['-is_top', '-created_at']
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+
+class TiebaDailyActivity(models.Model):
+    """贴吧每日活跃统计
+
+    每个贴吧每天一行（按 settings.TIME_ZONE 划分日期），发帖、评论、加入时
+    用 upsert 累加当天的行；今日数据读当天的行，趋势按日期区间汇总，
+    不需要每天零点批量清零。
+    """
+    
+    tieba = models.ForeignKey(
+        Tieba,
+        on_delete=models.CASCADE,
+        related_name='daily_activities',
+        verbose_name='贴吧'
+    )
+    date = models.DateField('日期')
+    
+    # 统计字段
+    post_count = models.IntegerField('发帖数', default=0)
+    comment_count = models.IntegerField('评论数', default=0)
+    new_member_count = models.IntegerField('新成员数', default=0)
+    active_user_count = models.IntegerField('活跃用户数', default=0)
+    
+    class Meta:
+        db_table = 'tieba_daily_activity'
+        verbose_name = '贴吧每日活跃'
+        verbose_name_plural = '贴吧每日活跃'
+        unique_together = ('tieba', 'date')
+    
+    def __str__(self):
+        return f'{self.tieba} - {self.date}'
+
+
+class TiebaActiveUser(models.Model):
+    """贴吧每日活跃用户去重记录（用于 TiebaDailyActivity.active_user_count，可定期清理）"""
+    
+    tieba = models.ForeignKey(
+        Tieba,
+        on_delete=models.CASCADE,
+        related_name='active_users',
+        verbose_name='贴吧'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='用户'
+    )
+    date = models.DateField('日期')
+    
+    class Meta:
+        db_table = 'tieba_active_user'
+        verbose_name = '贴吧活跃用户'
+        verbose_name_plural = '贴吧活跃用户'
+        unique_together = ('tieba', 'date', 'user')
+    
+    def __str__(self):
+        return f'{self.user} - {self.tieba} - {self.date}'
+
+
+class TiebaSearchToken(models.Model):
+    """贴吧检索词表
+
+    贴吧名称和描述开头部分切分出的词（中日韩二元组/单字、字母数字词），
+    每个贴吧每个词一行；只出现在描述中的词 source=1。
+    member_count 为建索引时的成员数，用于同一词下按热度排序。
+    """
+    
+    SOURCE_CHOICES = [
+        (0, '名称'),
+        (1, '描述'),
+    ]
+    
+    token = models.CharField('词', max_length=32)
+    tieba = models.ForeignKey(
+        Tieba,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name='贴吧'
+    )
+    source = models.SmallIntegerField('来源', choices=SOURCE_CHOICES, default=0)
+    member_count = models.IntegerField('成员数', default=0)
+    
+    class Meta:
+        db_table = 'tieba_search_token'
+        verbose_name = '贴吧检索词'
+        verbose_name_plural = '贴吧检索词'
+        unique_together = ('token', 'tieba')
+        indexes = [
+            # 单词检索：token=? ORDER BY source, -member_count，按索引顺序读取无需排序
+            models.Index(
+                fields=['token', 'source', '-member_count', 'tieba'],
+                name='tieba_search_rank_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.token} - {self.tieba_id}'
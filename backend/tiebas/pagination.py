@@ -0,0 +1,20 @@
+"""
+贴吧成员列表分页
+
+MemberCursorPagination 按 (role, post_count, id) 降序做键集分页：
+吧主在前，其余按发帖数，翻页条件落在 tieba_member_list_idx 上，
+不产生 OFFSET 扫描，也不需要 COUNT(*)，大吧的最后一页和第一页开销相同。
+"""
+
+from common.pagination import KeysetCursorPagination
+
+
+class MemberCursorPagination(KeysetCursorPagination):
+    """贴吧成员键集（游标）分页"""
+
+    page_size = 50
+    max_page_size = 200
+
+    # id 保证排序键唯一
+    ordering = ('-role', '-post_count', '-id')
+    cursor_fields = (('role', int), ('post_count', int), ('id', int))
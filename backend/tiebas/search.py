@@ -0,0 +1,201 @@
+"""
+贴吧检索
+
+贴吧名称和描述开头部分按 posts.search.tokenize 切词写入 TiebaSearchToken，
+检索结果分层排序：
+1. 名称完全匹配（name 唯一索引的等值查询）
+2. 名称前缀匹配（走 name 唯一索引的区间查询，按页读取）
+3. 所有词都出现在名称中
+4. 有词只出现在描述中
+同层内按成员数降序。单个词的检索直接按 tieba_search_rank_idx 的顺序读取，
+不需要对命中的全部贴吧排序。
+"""
+
+from django.db.models import Count, Max
+
+from posts.search import tokenize
+
+from .models import TiebaSearchToken
+
+# 描述只索引开头部分，限制每个贴吧的词数
+DESCRIPTION_INDEX_LENGTH = 200
+# 最多返回的结果数，常见单字的计数只扫描到该上限为止
+MAX_RESULTS = 1000
+# 成员数变化超过该比例时才刷新词表中的排序权重
+WEIGHT_REFRESH_RATIO = 0.1
+
+MATCH_EXACT = 'exact'
+MATCH_PREFIX = 'prefix'
+MATCH_NAME = 'name'
+MATCH_DESCRIPTION = 'description'
+
+
+def _clip(token):
+    return token[:TiebaSearchToken._meta.get_field('token').max_length]
+
+
+def build_tokens(tieba):
+    """返回 {词: 来源}，名称中的词优先记为名称来源"""
+    tokens = {}
+    for token in tokenize(tieba.description[:DESCRIPTION_INDEX_LENGTH]):
+        tokens[_clip(token)] = 1
+    for token in tokenize(tieba.name):
+        tokens[_clip(token)] = 0
+    return tokens
+
+
+def index_tieba(tieba):
+    """按贴吧当前的名称、描述、状态同步词表，只写有变化的行"""
+    if tieba.status != 1:
+        remove_tieba(tieba.pk)
+        return
+    wanted = build_tokens(tieba)
+    current = {
+        token: (source, member_count) for token, source, member_count in
+        TiebaSearchToken.objects.filter(tieba_id=tieba.pk).values_list('token', 'source', 'member_count')
+    }
+
+    stale = [token for token, (source, _) in current.items() if wanted.get(token) != source]
+    if stale:
+        TiebaSearchToken.objects.filter(tieba_id=tieba.pk, token__in=stale).delete()
+    TiebaSearchToken.objects.bulk_create([
+        TiebaSearchToken(token=token, tieba_id=tieba.pk, source=source, member_count=tieba.member_count)
+        for token, source in wanted.items()
+        if token in stale or token not in current
+    ])
+
+    # 成员数频繁变化，只有变化明显时才改写权重
+    indexed_count = next(iter(current.values()))[1] if current else tieba.member_count
+    if abs(tieba.member_count - indexed_count) > max(1, indexed_count * WEIGHT_REFRESH_RATIO):
+        TiebaSearchToken.objects.filter(tieba_id=tieba.pk).update(member_count=tieba.member_count)
+
+
+def remove_tieba(tieba_id):
+    TiebaSearchToken.objects.filter(tieba_id=tieba_id).delete()
+
+
+def rebuild(tiebas, batch_size=1000):
+    """重建全部词表"""
+    TiebaSearchToken.objects.all().delete()
+    batch = []
+    for tieba in tiebas:
+        if tieba.status != 1:
+            continue
+        batch.extend(
+            TiebaSearchToken(token=token, tieba_id=tieba.pk, source=source, member_count=tieba.member_count)
+            for token, source in build_tokens(tieba).items()
+        )
+        if len(batch) >= batch_size:
+            TiebaSearchToken.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TiebaSearchToken.objects.bulk_create(batch)
+
+
+class TiebaSearchResults:
+    """贴吧检索结果的惰性序列
+
+    实现 count() 与切片，可直接交给 DRF 分页器；
+    返回的贴吧带 match_type 属性（exact/prefix/name/description）。
+    """
+
+    def __init__(self, query, queryset):
+        self.query = query.strip()
+        self.queryset = queryset
+        self.tokens = list(dict.fromkeys(_clip(token) for token in tokenize(self.query, for_query=True)))
+        self._exact = None
+        self._prefix_count = None
+        self._count = None
+
+    def _prefix_range(self):
+        """名称以查询串开头（含完全匹配）的区间条件"""
+        return {'name__gte': self.query, 'name__lt': self.query + '\U0010ffff'}
+
+    def exact(self):
+        """名称完全匹配的贴吧ID（至多一个）"""
+        if self._exact is None:
+            self._exact = list(self.queryset.filter(name=self.query).values_list('id', flat=True)[:1])
+        return self._exact
+
+    def prefix_queryset(self):
+        """名称前缀匹配（不含完全匹配）的贴吧ID，按成员数排序"""
+        return self.queryset.filter(**self._prefix_range()).exclude(name=self.query).order_by(
+            '-member_count', 'id'
+        ).values_list('id', flat=True)
+
+    def prefix_count(self):
+        if self._prefix_count is None:
+            self._prefix_count = self.prefix_queryset()[:MAX_RESULTS].count()
+        return self._prefix_count
+
+    def token_queryset(self):
+        """按层级和成员数排序的 (贴吧ID, 来源)，已排除名称前缀层（含完全匹配）"""
+        queryset = TiebaSearchToken.objects.exclude(
+            **{f'tieba__{lookup}': value for lookup, value in self._prefix_range().items()}
+        )
+        if len(self.tokens) == 1:
+            return queryset.filter(token=self.tokens[0]).order_by(
+                'source', '-member_count', 'tieba_id'
+            ).values_list('tieba_id', 'source')
+        # 多个词：每个词都要命中，任一词只在描述中出现则归入描述层
+        return queryset.filter(token__in=self.tokens).values('tieba_id').annotate(
+            matched=Count('pk'), worst_source=Max('source'), weight=Max('member_count')
+        ).filter(matched=len(self.tokens)).order_by(
+            'worst_source', '-weight', 'tieba_id'
+        ).values_list('tieba_id', 'worst_source')
+
+    def count(self):
+        if self._count is None:
+            self._count = min(len(self.exact()) + self.prefix_count(), MAX_RESULTS)
+            if self.tokens and self._count < MAX_RESULTS:
+                self._count += self.token_queryset()[:MAX_RESULTS - self._count].count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def _tiers(self):
+        """[(层大小, 读取 [start, stop) 的函数)]，最后一层大小为 None"""
+        tiers = [
+            (len(self.exact()), lambda start, stop: [(pk, MATCH_EXACT) for pk in self.exact()[start:stop]]),
+            (self.prefix_count(), lambda start, stop: [
+                (pk, MATCH_PREFIX) for pk in self.prefix_queryset()[start:stop]
+            ]),
+        ]
+        if self.tokens:
+            tiers.append((None, lambda start, stop: [
+                (pk, MATCH_NAME if source == 0 else MATCH_DESCRIPTION)
+                for pk, source in self.token_queryset()[start:stop]
+            ]))
+        return tiers
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        stop = min(key.stop if key.stop is not None else self.count(), MAX_RESULTS)
+        if stop <= offset or not self.query:
+            return []
+
+        # 依次跳过前面的层，只读取与 [offset, stop) 相交的部分
+        matches = []
+        position = 0
+        for size, fetch in self._tiers():
+            start = max(offset - position, 0)
+            end = stop - position if size is None else min(stop - position, size)
+            if end > start:
+                matches += fetch(start, end)
+            if size is None:
+                break
+            position += size
+            if position >= stop:
+                break
+
+        tiebas = self.queryset.in_bulk([pk for pk, _ in matches])
+        results = []
+        for pk, match_type in matches:
+            # 词表中可能残留刚被封禁的贴吧，按当前查询集过滤掉
+            if pk in tiebas:
+                tiebas[pk].match_type = match_type
+                results.append(tiebas[pk])
+        return results
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import TiebaCategory, Tieba, TiebaMember, TiebaAnnouncement
 from users.models import User
+from common.fieldsets import SparseFieldsetSerializerMixin
+from .activity import get_today_post_counts
 
 
 class TiebaCategorySerializer(serializers.ModelSerializer):
@@ -8,7 +10,11 @@ class TiebaCategorySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = TiebaCategory
-        fields = ['id', 'name', 'description', 'sort_order', 'status', 'created_at']
+        fields = [
+            'id', 'name', 'description', 'sort_order', 'status', 'created_at',
+            'tieba_count', 'member_count'
+        ]
+        read_only_fields = ['tieba_count', 'member_count']
 
 
 class UserSimpleSerializer(serializers.ModelSerializer):
@@ -19,11 +25,12 @@ class UserSimpleSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'nickname', 'avatar']
 
 
-class TiebaSerializer(serializers.ModelSerializer):
+class TiebaSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """贴吧序列化器"""
     
     owner_info = UserSimpleSerializer(source='owner', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
+    today_post_count = serializers.SerializerMethodField()
     is_member = serializers.SerializerMethodField()
     member_role = serializers.SerializerMethodField()
     
@@ -36,29 +43,47 @@ class TiebaSerializer(serializers.ModelSerializer):
             'status', 'is_recommended', 'created_at', 'updated_at',
             'is_member', 'member_role'
         ]
-        read_only_fields = ['owner', 'member_count', 'post_count', 'today_post_count']
+        read_only_fields = ['owner', 'member_count', 'post_count']
     
-    def get_is_member(self, obj):
-        """检查当前用户是否为该贴吧成员"""
+    def get_today_post_count(self, obj):
+        """今日（Asia/Shanghai）发帖数，来自当天的活跃统计"""
+        counts = self.context.get('today_post_counts')
+        if counts is None:
+            counts = get_today_post_counts([obj.pk])
+        return counts.get(obj.pk, 0)
+    
+    def _membership(self, obj):
+        """当前用户在该贴吧的 (角色, 状态)，不是成员时为 None"""
+        # 视图已批量加载整页的成员关系时直接读取
+        memberships = self.context.get('tieba_memberships')
+        if memberships is not None:
+            return memberships.get(obj.pk)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return TiebaMember.objects.filter(
-                user=request.user, 
-                tieba=obj, 
-                status=1
-            ).exists()
-        return False
+                user=request.user, tieba=obj
+            ).values_list('role', 'status').first()
+        return None
+    
+    def get_is_member(self, obj):
+        """检查当前用户是否为该贴吧成员"""
+        membership = self._membership(obj)
+        return membership is not None and membership[1] == 1
     
     def get_member_role(self, obj):
         """获取当前用户在该贴吧的角色"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                member = TiebaMember.objects.get(user=request.user, tieba=obj)
-                return member.role
-            except TiebaMember.DoesNotExist:
-                return None
-        return None
+        membership = self._membership(obj)
+        return membership[0] if membership is not None else None
+
+
+class TiebaSearchResultSerializer(serializers.ModelSerializer):
+    """贴吧搜索结果序列化器（轻量，不含成员关系）"""
+    
+    match_type = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = Tieba
+        fields = ['id', 'name', 'avatar', 'member_count', 'post_count', 'match_type']
 
 
 class TiebaCreateSerializer(serializers.ModelSerializer):
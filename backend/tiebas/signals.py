@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from common.conditional import bump_object_version
+
+from . import listings, search
+from .autocomplete import autocomplete
+from .memberships import invalidate_memberships
+from .models import Tieba, TiebaCategory, TiebaMember
+
+
+@receiver(post_save, sender=TiebaMember)
+@receiver(post_delete, sender=TiebaMember)
+def invalidate_member_state(sender, instance, **kwargs):
+    """加入、退出、升降角色后使该用户的成员关系缓存和贴吧详情的 ETag 失效"""
+    def invalidate():
+        invalidate_memberships(instance.user_id)
+        # 详情中的 is_member / member_role 随之变化
+        bump_object_version(Tieba, instance.tieba_id)
+
+    transaction.on_commit(invalidate)
+
+
+def _listed_category(status, category_id):
+    """计入分类统计的分类ID：只有正常状态的贴吧计入"""
+    return category_id if status == 1 else None
+
+
+@receiver(pre_save, sender=Tieba)
+def remember_listed_category(sender, instance, raw=False, **kwargs):
+    """记下保存前计入的分类，保存后比较审核状态、分类是否变化"""
+    instance._listed_category = None
+    if instance.pk is not None and not raw:
+        previous = Tieba.objects.filter(pk=instance.pk).values('status', 'category_id').first()
+        if previous is not None:
+            instance._listed_category = _listed_category(previous['status'], previous['category_id'])
+
+
+@receiver(post_save, sender=Tieba)
+def update_category_counts(sender, instance, raw=False, **kwargs):
+    """贴吧创建、审核状态或分类变化后，把它的成员数从旧分类移到新分类"""
+    if raw:
+        return
+    old = getattr(instance, '_listed_category', None)
+    new = _listed_category(instance.status, instance.category_id)
+    if old == new:
+        return
+    # 成员数用 F() 更新，内存中的值可能已过时，按数据库中的值移动
+    member_count = Tieba.objects.filter(pk=instance.pk).values_list('member_count', flat=True).first() or 0
+    listings.adjust_category_counts(old, tiebas=-1, members=-member_count)
+    listings.adjust_category_counts(new, tiebas=1, members=member_count)
+
+
+@receiver(post_delete, sender=Tieba)
+def remove_from_category_counts(sender, instance, **kwargs):
+    listings.adjust_category_counts(
+        _listed_category(instance.status, instance.category_id),
+        tiebas=-1, members=-instance.member_count,
+    )
+
+
+@receiver(post_save, sender=Tieba)
+def index_tieba_search(sender, instance, **kwargs):
+    """贴吧创建、改名、封禁后同步检索词表（删除贴吧时词表随外键级联删除）"""
+    transaction.on_commit(lambda: search.index_tieba(instance))
+
+
+@receiver(post_save, sender=Tieba)
+def update_tieba_autocomplete(sender, instance, **kwargs):
+    """贴吧创建、改名、封禁、成员数变化后更新本进程的自动补全索引"""
+    transaction.on_commit(lambda: autocomplete.update(instance))
+
+
+@receiver(post_delete, sender=Tieba)
+def remove_tieba_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.remove(instance.pk))
+
+
+@receiver(post_save, sender=Tieba)
+def refresh_recommended_listing(sender, instance, **kwargs):
+    transaction.on_commit(lambda: listings.tieba_changed(instance))
+
+
+def tieba_counts_changed(tieba):
+    """成员数用 F() 更新、没有经过 save() 时，同步自动补全、检索权重和推荐快照"""
+    def sync():
+        search.index_tieba(tieba)
+        autocomplete.update(tieba)
+        listings.tieba_changed(tieba)
+
+    transaction.on_commit(sync)
+
+
+@receiver(post_save, sender=TiebaCategory)
+@receiver(post_delete, sender=TiebaCategory)
+def refresh_category_listing(sender, instance, **kwargs):
+    """分类增删改后首页列表快照失效"""
+    transaction.on_commit(listings.bump_version)
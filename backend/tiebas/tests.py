@@ -0,0 +1,51 @@
+"""
+加入、退出贴吧的并发测试
+"""
+
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from common.tests import THREADS, run_concurrently
+from users.models import User
+
+from .models import Tieba, TiebaMember
+
+TIEBAS_URL = '/api/tiebas/tiebas/'
+
+
+class MembershipConcurrencyTests(TransactionTestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('owner', password='pw12345')
+        self.tieba = Tieba.objects.create(name='并发吧', owner=owner, status=1, member_count=1)
+        TiebaMember.objects.create(user=owner, tieba=self.tieba, role=2, status=1)
+
+    def request(self, user, action):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(f'{TIEBAS_URL}{self.tieba.pk}/{action}/').status_code
+
+    def test_join_and_leave_keep_member_count(self):
+        users = [User.objects.create_user(f'user{i}', password='pw12345') for i in range(THREADS)]
+
+        statuses = run_concurrently(self.request, [(user, 'join') for user in users])
+
+        self.assertEqual(statuses, [200] * THREADS)
+        self.tieba.refresh_from_db()
+        self.assertEqual(self.tieba.member_count, THREADS + 1)
+
+        statuses = run_concurrently(self.request, [(user, 'leave') for user in users])
+
+        self.assertEqual(statuses, [200] * THREADS)
+        self.tieba.refresh_from_db()
+        self.assertEqual(self.tieba.member_count, 1)
+
+    def test_repeated_join_counts_once(self):
+        user = User.objects.create_user('user', password='pw12345')
+
+        statuses = run_concurrently(self.request, [(user, 'join')] * THREADS)
+
+        self.assertEqual(sorted(statuses), [200] + [400] * (THREADS - 1))
+        self.tieba.refresh_from_db()
+        self.assertEqual(self.tieba.member_count, 2)
+        self.assertEqual(TiebaMember.objects.filter(tieba=self.tieba).count(), 2)
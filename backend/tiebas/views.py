@@ -1,13 +1,22 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from django.db import transaction
+from common.conditional import ConditionalGetMixin
+from common.counters import toggle_relation
+from common.fieldsets import SparseFieldsetViewMixin
+from .activity import get_activity_trend, get_today_post_counts, record_activity, today
+from .autocomplete import MAX_SUGGESTIONS, autocomplete
+from .listings import PER_USER_FIELDS, adjust_category_counts, get_categories, get_recommended
+from .memberships import get_memberships
 from .models import TiebaCategory, Tieba, TiebaMember, TiebaAnnouncement
+from .pagination import MemberCursorPagination
+from .search import TiebaSearchResults
+from .signals import tieba_counts_changed
 from .serializers import (
     TiebaCategorySerializer, TiebaSerializer, TiebaCreateSerializer,
-    TiebaMemberSerializer, TiebaAnnouncementSerializer
+    TiebaMemberSerializer, TiebaAnnouncementSerializer, TiebaSearchResultSerializer
 )
 
 
@@ -17,22 +26,64 @@ class TiebaCategoryViewSet(viewsets.ModelViewSet):
     queryset = TiebaCategory.objects.filter(status=True)
     serializer_class = TiebaCategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    
+    def list(self, request, *args, **kwargs):
+        """分类列表（共享快照，不查询数据库）"""
+        categories = get_categories()
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(categories)
 
 
-class TiebaViewSet(viewsets.ModelViewSet):
+class TiebaViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """贴吧视图集"""
     
     queryset = Tieba.objects.filter(status=1)  # 只显示正常状态的贴吧
     permission_classes = [IsAuthenticatedOrReadOnly]
+    # 吧主资料和分类名称嵌套在响应中（分类没有更新时间，直接比较名称）
+    etag_fields = ('updated_at', 'member_count', 'post_count', 'owner__updated_at', 'category__name')
+    # 计数用 F() 更新，不会改变 updated_at，只用 ETag 校验
+    last_modified_fields = ()
+    sparse_select_related = {'owner_info': 'owner', 'category_name': 'category'}
+    # 活跃排行的排序，分别落在 tieba_member_posts_idx / tieba_member_comments_idx 上
+    CONTRIBUTOR_ORDERING = {
+        'posts': ('-post_count', '-id'),
+        'comments': ('-comment_count', '-id'),
+    }
+    
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
     
     def get_serializer_class(self):
         if self.action == 'create':
             return TiebaCreateSerializer
         return TiebaSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        """序列化贴吧时一次加载整页的成员关系（is_member / member_role 共用）和今日发帖数"""
+        serializer_class = self.get_serializer_class()
+        kwargs.setdefault('context', self.get_serializer_context())
+        selection = self.get_sparse_fields()
+        wants_state = selection is None or {'is_member', 'member_role'} & selection
+        wants_today = selection is None or 'today_post_count' in selection
+        if args and serializer_class is TiebaSerializer and (wants_state or wants_today):
+            tiebas = args[0] if kwargs.get('many') else [args[0]]
+            tieba_ids = [tieba.pk for tieba in tiebas]
+            if wants_state:
+                kwargs['context']['tieba_memberships'] = get_memberships(self.request.user, tieba_ids)
+            if wants_today:
+                kwargs['context']['today_post_counts'] = get_today_post_counts(tieba_ids)
+        return serializer_class(*args, **kwargs)
+    
+    def get_etag_extra(self):
+        # 今日发帖数在零点归零，日期变化时详情缓存失效
+        return [today()]
+    
     def perform_create(self, serializer):
         """创建贴吧时设置创建者"""
-        tieba = serializer.save(owner=self.request.user)
+        # 创建者计入成员数，不需要再保存一次
+        tieba = serializer.save(owner=self.request.user, member_count=1)
         # 创建者自动成为大吧主
         TiebaMember.objects.create(
             user=self.request.user,
@@ -40,33 +91,31 @@ class TiebaViewSet(viewsets.ModelViewSet):
             role=2,  # 大吧主
             status=1  # 正常
         )
-        # 更新贴吧成员数
-        tieba.member_count = 1
-        tieba.save()
+        record_activity(tieba.pk, new_members=1)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def join(self, request, pk=None):
         """加入贴吧"""
         tieba = self.get_object()
         
-        # 检查是否已经是成员
-        if TiebaMember.objects.filter(user=request.user, tieba=tieba).exists():
+        # 创建成员关系（普通成员、正常状态），已是成员时唯一约束冲突，不重复计数；
+        # 贴吧和分类的成员数在同一个事务中更新
+        with transaction.atomic():
+            changed, member_count = toggle_relation(
+                TiebaMember, {'user': request.user, 'tieba': tieba, 'status': 1},
+                Tieba, tieba.pk, 'member_count', True
+            )
+            if changed:
+                adjust_category_counts(tieba.category_id, members=1)
+        if not changed:
             return Response(
                 {'error': '您已经是该贴吧成员'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # 创建成员关系
-        TiebaMember.objects.create(
-            user=request.user,
-            tieba=tieba,
-            role=0,  # 普通成员
-            status=1  # 正常
-        )
-        
-        # 更新贴吧成员数
-        tieba.member_count += 1
-        tieba.save()
+        tieba.member_count = member_count
+        tieba_counts_changed(tieba)
+        record_activity(tieba.pk, new_members=1)
         
         return Response({'message': '成功加入贴吧'})
     
@@ -84,11 +133,17 @@ class TiebaViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            member.delete()
-            
-            # 更新贴吧成员数
-            tieba.member_count -= 1
-            tieba.save()
+            # 只删除普通成员；并发的重复退出只有一个请求减少成员数
+            with transaction.atomic():
+                changed, member_count = toggle_relation(
+                    TiebaMember, {'pk': member.pk, 'role': 0},
+                    Tieba, tieba.pk, 'member_count', False
+                )
+                if changed:
+                    adjust_category_counts(tieba.category_id, members=-1)
+            if changed:
+                tieba.member_count = member_count
+                tieba_counts_changed(tieba)
             
             return Response({'message': '成功退出贴吧'})
         except TiebaMember.DoesNotExist:
@@ -97,38 +152,116 @@ class TiebaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        """贴吧活跃趋势：最近 days 天（7 或 30，默认 7）的逐日发帖、评论、新成员、活跃用户数"""
+        tieba = self.get_object()
+        days = request.query_params.get('days', '7')
+        if days not in ('7', '30'):
+            return Response(
+                {'error': 'days 只能是 7 或 30'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(get_activity_trend(tieba.pk, int(days)))
+    
     @action(detail=False, methods=['get'])
     def recommended(self, request):
-        """推荐贴吧"""
-        recommended_tiebas = Tieba.objects.filter(
-            is_recommended=True, 
-            status=1
-        ).order_by('-member_count')[:10]
-        serializer = self.get_serializer(recommended_tiebas, many=True)
-        return Response(serializer.data)
+        """推荐贴吧（共享快照，命中后只补当前用户的成员关系）"""
+        selection = self.get_sparse_fields()
+        results = [
+            {key: value for key, value in item.items() if selection is None or key in selection}
+            for item in get_recommended(request)
+        ]
+        wanted = [name for name in PER_USER_FIELDS if selection is None or name in selection]
+        if wanted:
+            # 匿名用户不查询；登录用户的成员关系有按用户的缓存
+            memberships = get_memberships(request.user, [item['id'] for item in results])
+            for item in results:
+                membership = memberships.get(item['id'])
+                if 'is_member' in wanted:
+                    item['is_member'] = membership is not None and membership[1] == 1
+                if 'member_role' in wanted:
+                    item['member_role'] = membership[0] if membership is not None else None
+        return Response(results)
+    
+    @action(detail=False, methods=['get'], authentication_classes=[], permission_classes=[AllowAny])
+    def autocomplete(self, request):
+        """贴吧名称自动补全（进程内索引，不查询数据库，也不做用户认证）"""
+        try:
+            limit = int(request.query_params.get('limit', MAX_SUGGESTIONS))
+        except ValueError:
+            limit = MAX_SUGGESTIONS
+        return Response(autocomplete.suggest(request.query_params.get('q', ''), limit))
     
     @action(detail=False, methods=['get'])
     def search(self, request):
         """搜索贴吧"""
-        query = request.query_params.get('q', '')
+        query = request.query_params.get('q', '').strip()
         if not query:
             return Response([])
         
-        tiebas = Tieba.objects.filter(
-            Q(name__icontains=query) | Q(description__icontains=query),
-            status=1
-        ).order_by('-member_count')
-        
-        serializer = self.get_serializer(tiebas, many=True)
+        # 名称完全匹配、前缀匹配优先，其次名称命中、描述命中，同层按成员数排序
+        results = TiebaSearchResults(
+            query, Tieba.objects.filter(status=1).only('id', 'name', 'avatar', 'member_count', 'post_count')
+        )
+        page = self.paginate_queryset(results)
+        if page is not None:
+            serializer = TiebaSearchResultSerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        serializer = TiebaSearchResultSerializer(results[:], many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
+    def _member_queryset(self, tieba):
+        """正常状态的成员，用户信息随成员一起读取且只取展示用的列"""
+        return TiebaMember.objects.filter(tieba=tieba, status=1).select_related('user').only(
+            'id', 'user', 'tieba', 'role', 'status', 'post_count', 'comment_count',
+            'joined_at', 'last_active_at',
+            'user__id', 'user__username', 'user__nickname', 'user__avatar',
+        )
+    
+    def _serialize_members(self, tieba, members):
+        for member in members:
+            # 同一个贴吧，直接挂上已加载的对象，tieba_name 不再逐行查询
+            member.tieba = tieba
+        return TiebaMemberSerializer(members, many=True, context=self.get_serializer_context()).data
+    
     @action(detail=True, methods=['get'])
     def members(self, request, pk=None):
-        """获取贴吧成员列表"""
+        """获取贴吧成员列表（按角色、发帖数键集分页，可用 role 过滤）"""
         tieba = self.get_object()
-        members = TiebaMember.objects.filter(tieba=tieba, status=1).order_by('-role', '-post_count')
-        serializer = TiebaMemberSerializer(members, many=True)
-        return Response(serializer.data)
+        members = self._member_queryset(tieba)
+        role = request.query_params.get('role')
+        if role is not None:
+            if role not in ('0', '1', '2'):
+                return Response(
+                    {'error': 'role 只能是 0、1 或 2'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            members = members.filter(role=int(role))
+        paginator = MemberCursorPagination()
+        page = paginator.paginate_queryset(members, request, view=self)
+        return paginator.get_paginated_response(self._serialize_members(tieba, page))
+    
+    @action(detail=True, methods=['get'])
+    def contributors(self, request, pk=None):
+        """贴吧活跃排行（by=posts 按发帖数，by=comments 按评论数）"""
+        tieba = self.get_object()
+        by = request.query_params.get('by', 'posts')
+        if by not in self.CONTRIBUTOR_ORDERING:
+            return Response(
+                {'error': 'by 只能是 posts 或 comments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            limit = 10
+        count_field = self.CONTRIBUTOR_ORDERING[by][0].lstrip('-')
+        members = list(
+            self._member_queryset(tieba).filter(**{f'{count_field}__gt': 0})
+            .order_by(*self.CONTRIBUTOR_ORDERING[by])[:limit]
+        )
+        return Response(self._serialize_members(tieba, members))
 
 
 class TiebaMemberViewSet(viewsets.ModelViewSet):
@@ -140,7 +273,8 @@ class TiebaMemberViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """过滤查询集"""
-        queryset = super().get_queryset()
+        # user_info / tieba_name 随成员一起读取
+        queryset = super().get_queryset().select_related('user', 'tieba')
         tieba_id = self.request.query_params.get('tieba_id')
         if tieba_id:
             queryset = queryset.filter(tieba_id=tieba_id)